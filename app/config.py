@@ -2,14 +2,17 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Load .env if present
-env_path = Path(__file__).resolve().parents[1] / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
+_ROOT = Path(__file__).resolve().parents[1]
+
+# Load .env if present (CONSILIUM_SKIP_DOTENV=1 for pre-seeded environments)
+if os.getenv('CONSILIUM_SKIP_DOTENV') != '1':
+    env_path = _ROOT / '.env'
+    if env_path.exists():
+        load_dotenv(env_path)
 
 # Base settings
 BASE_ID_URL = os.getenv('BASE_ID_URL', 'http://localhost:8000')
-DB_PATH = os.getenv('CONSILIUM_DB_PATH', str(Path(__file__).resolve().parents[1] / 'data' / 'consilium.db'))
+DB_PATH = os.getenv('CONSILIUM_DB_PATH', str(_ROOT / 'data' / 'consilium.db'))
 
 # Google Drive
 GDRIVE_ROOT_FOLDER_ID = os.getenv('GDRIVE_ROOT_FOLDER_ID', '')
@@ -19,7 +22,7 @@ GDRIVE_OAUTH_TOKEN = os.path.expanduser(os.getenv('GDRIVE_OAUTH_TOKEN', ''))
 
 # Notifications (minimal stub)
 NOTIF_ENABLE = os.getenv('NOTIF_ENABLE', '1') in ('1', 'true', 'True')
-NOTIF_LOG_PATH = os.getenv('NOTIF_LOG_PATH', str(Path(__file__).resolve().parents[1] / 'logs' / 'notifications.log'))
+NOTIF_LOG_PATH = os.getenv('NOTIF_LOG_PATH', str(_ROOT / 'logs' / 'notifications.log'))
 
 # Email (SMTP)
 SMTP_HOST = os.getenv('SMTP_HOST', '')
@@ -39,6 +42,7 @@ MATRIX_ROOM_ID = os.getenv('MATRIX_ROOM_ID', '')
 INTEGRITY_INTERVAL_MIN = int(os.getenv('INTEGRITY_INTERVAL_MIN', '60'))  # minutes
 INTEGRITY_BATCH = int(os.getenv('INTEGRITY_BATCH', '50'))
 INTEGRITY_INCLUDE_STATUSES = os.getenv('INTEGRITY_INCLUDE_STATUSES', 'registered,delivered')
+INTEGRITY_CONCURRENCY = int(os.getenv('INTEGRITY_CONCURRENCY', '8'))  # parallel Drive downloads
 
 # Embed metadata (B2)
 EMBED_MODE = os.getenv('EMBED_MODE', 'revision')  # revision|copy|sidecar
@@ -61,4 +65,15 @@ try:
     OCR_MAX_PAGES = int(os.getenv('OCR_MAX_PAGES', '20'))  # page cap for OCR
 except Exception:
     OCR_MAX_PAGES = 20
+try:
+    OCR_PROCESSES = max(1, int(os.getenv('OCR_PROCESSES', str((os.cpu_count() or 2) // 2))))  # OCR worker processes
+except Exception:
+    OCR_PROCESSES = 1
+try:
+    # pages in parallel *per OCR process*: the default splits the CPUs across
+    # OCR_PROCESSES so the total stays near cpu_count
+    OCR_CONCURRENCY = max(1, int(os.getenv('OCR_CONCURRENCY', str((os.cpu_count() or 1) // OCR_PROCESSES))))
+except Exception:
+    OCR_CONCURRENCY = 1
+OCR_FORMAT = os.getenv('OCR_FORMAT', 'jpeg').lower()  # rendered page format: jpeg (smaller) or png (lossless)
 DEBUG_OCR = os.getenv('DEBUG_OCR', 'false').lower() in ('1', 'true', 'yes')
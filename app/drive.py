@@ -1,55 +1,215 @@
 import os
-import io
+import hashlib
+import json
 import mimetypes
-from typing import Dict
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import httplib2
+import httpx
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
+from sqlalchemy import text
 from .config import GDRIVE_OAUTH_CLIENT, GDRIVE_OAUTH_TOKEN
+from .db import engine
 
 SCOPES = [
     "https://www.googleapis.com/auth/drive.file",
     "https://www.googleapis.com/auth/drive.metadata.readonly",
 ]
 
+# expand $HOME and ~ for paths from env once, at import
+def _expand(p: str) -> str:
+    return os.path.expanduser(os.path.expandvars(p))
+
+_OAUTH_CLIENT_PATH = _expand(GDRIVE_OAUTH_CLIENT) if GDRIVE_OAUTH_CLIENT else ""
+_OAUTH_TOKEN_PATH = _expand(GDRIVE_OAUTH_TOKEN) if GDRIVE_OAUTH_TOKEN else None
+
 _service = None
+_service_lock = threading.Lock()
+
+# Parse system mime.types once at import instead of on the first upload
+mimetypes.init()
+_MIME_CACHE: Dict[str, str] = {}
+
+# Types the app actually uploads; mimetypes is only consulted on a miss
+_EXT_MIME = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".doc": "application/msword",
+    ".odt": "application/vnd.oasis.opendocument.text",
+    ".rtf": "application/rtf",
+    ".txt": "text/plain",
+    ".eml": "message/rfc822",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+}
+
+def _guess_mime(local_path: str) -> str:
+    ext = os.path.splitext(local_path)[1].lower()
+    mime = _EXT_MIME.get(ext) or _MIME_CACHE.get(ext)
+    if mime is None:
+        mime = mimetypes.guess_type(local_path)[0] or "application/octet-stream"
+        _MIME_CACHE[ext] = mime
+    return mime
+
+def _save_token(token_path: str, new_json: str) -> None:
+    """Write token JSON atomically, skipping the write if nothing changed."""
+    try:
+        with open(token_path) as f:
+            if f.read() == new_json:
+                return
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(token_path), exist_ok=True)
+    tmp = token_path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(new_json)
+    os.replace(tmp, token_path)
+
+class _Http2Transport:
+    """httplib2.Http-compatible shim over a shared httpx.Client with HTTP/2.
+
+    googleapiclient and google-auth-httplib2 only call .request(), so this is
+    enough to multiplex every Drive call (from any worker thread)
+    over one pooled, thread-safe connection.
+    """
+
+    def __init__(self, timeout: float = 60.0):
+        self.client = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            max_redirects=httplib2.DEFAULT_MAX_REDIRECTS,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        )
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None, **kwargs):
+        if hasattr(body, "read"):
+            # resumable uploads pass a file-like slice of the current chunk
+            body = body.read()
+        # redirections=0 means "do not follow", as in httplib2
+        follow = redirections is None or redirections > 0
+        # googleapiclient's num_retries only recognises socket/OS errors, so map
+        # httpx's onto those to keep resets and timeouts retried
+        try:
+            r = self.client.request(method, uri, content=body, headers=headers, follow_redirects=follow)
+        except httpx.TimeoutException as e:
+            raise socket.timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise ConnectionError(str(e)) from e
+        info = {k: v for k, v in r.headers.items()}
+        content = r.content
+        if "content-encoding" in info:
+            # httpx already decoded the body; mirror httplib2's bookkeeping
+            info["-content-encoding"] = info.pop("content-encoding")
+            info["content-length"] = str(len(content))
+        info["status"] = str(r.status_code)
+        if r.reason_phrase:
+            info["reason"] = r.reason_phrase
+        return httplib2.Response(info), content
+
+    def close(self):
+        self.client.close()
+
+# One app-lifetime client: TLS sessions and HTTP/2 streams are reused by every call
+_transport = _Http2Transport()
 
 def get_service():
+    """Build the Drive client once and return the shared instance.
+
+    The lock keeps concurrent first callers from racing into the OAuth flow.
+    Failures are not cached, so a missing config raises on every call.
+    """
     global _service
-    if _service is not None:
+    with _service_lock:
+        if _service is not None:
+            return _service
+        if not GDRIVE_OAUTH_CLIENT:
+            raise RuntimeError("GDRIVE_OAUTH_CLIENT not configured")
+        token_path = _OAUTH_TOKEN_PATH
+        creds = None
+        if token_path and os.path.exists(token_path):
+            creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(_OAUTH_CLIENT_PATH, SCOPES)
+                creds = flow.run_local_server(port=0)
+            if token_path:
+                _save_token(token_path, creds.to_json())
+        _service = build("drive", "v3", http=AuthorizedHttp(creds, http=_transport))
         return _service
-    if not GDRIVE_OAUTH_CLIENT:
-        raise RuntimeError("GDRIVE_OAUTH_CLIENT not configured")
-    # expand $HOME and ~ for paths from env
-    def _expand(p: str) -> str:
-        return os.path.expanduser(os.path.expandvars(p))
-
-    token_path = _expand(GDRIVE_OAUTH_TOKEN) if GDRIVE_OAUTH_TOKEN else None
-    creds = None
-    if token_path and os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(_expand(GDRIVE_OAUTH_CLIENT), SCOPES)
-            creds = flow.run_local_server(port=0)
-        if token_path:
-            os.makedirs(os.path.dirname(token_path), exist_ok=True)
-            with open(token_path, "w") as f:
-                f.write(creds.to_json())
-    _service = build("drive", "v3", credentials=creds)
-    return _service
 
-def find_or_create_folder(name: str, parent_id: str) -> str:
+def close() -> None:
+    """Release the pooled Drive connections (app shutdown)."""
+    _transport.close()
+
+def __getattr__(name: str):
+    # `from .drive import svc` resolves the service lazily on first access
+    if name == "svc":
+        return get_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Drive answers 403 userRateLimitExceeded / 429 when writes exceed the per-user quota;
+# any other 403 (permissions, storage quota) will not clear by waiting
+RETRY_STATUSES = {403, 429}
+RATE_LIMIT_REASONS = {"userRateLimitExceeded", "rateLimitExceeded"}
+RETRY_MAX = 5
+
+def _error_reason(e: HttpError) -> str | None:
+    details = getattr(e, "error_details", None)
+    if isinstance(details, list) and details and isinstance(details[0], dict):
+        if details[0].get("reason"):
+            return details[0]["reason"]
+    # older clients leave error_details empty; the reason is still in the JSON body
+    try:
+        return json.loads(e.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+def _is_retryable(e: HttpError) -> bool:
+    status = e.resp.status
+    if status == 403:
+        return _error_reason(e) in RATE_LIMIT_REASONS
+    return status in RETRY_STATUSES
+
+def _execute_with_backoff(request):
+    for attempt in range(RETRY_MAX):
+        try:
+            return request.execute()
+        except HttpError as e:
+            if not _is_retryable(e) or attempt == RETRY_MAX - 1:
+                raise
+            time.sleep((2 ** attempt) + random.random())
+
+_FOLDER_Q_TMPL = (
+    "name = '{n}' and '{p}' in parents "
+    "and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+)
+# Drive query string literals escape backslash and single quote
+_Q_ESCAPE = str.maketrans({"\\": "\\\\", "'": "\\'"})
+
+def _find_or_create_folder_impl(name: str, parent_id: str) -> str:
     svc = get_service()
-    q = (
-        f"name = '{name.replace("'", "\\'")}' and '{parent_id}' in parents "
-        "and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-    )
-    r = svc.files().list(q=q, fields="files(id,name)").execute()
+    q = _FOLDER_Q_TMPL.format(n=name.translate(_Q_ESCAPE), p=parent_id)
+    r = svc.files().list(
+        q=q, fields="files(id)", pageSize=1,
+        corpora="user", spaces="drive", supportsAllDrives=False,
+    ).execute()
     items = r.get("files", [])
     if items:
         return items[0]["id"]
@@ -57,39 +217,268 @@ def find_or_create_folder(name: str, parent_id: str) -> str:
     f = svc.files().create(body=body, fields="id").execute()
     return f["id"]
 
+# --- Local cache in the app DB: folder ids ---
+_cache_tables_ready = False
+
+def _init_cache_tables() -> None:
+    global _cache_tables_ready
+    if _cache_tables_ready:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            """
+            CREATE TABLE IF NOT EXISTS drive_folders (
+                parent_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                folder_id TEXT NOT NULL,
+                created_at DATETIME,
+                PRIMARY KEY (parent_id, name)
+            )
+            """
+        ))
+    _cache_tables_ready = True
+
+@lru_cache(maxsize=2048)
+def find_or_create_folder(name: str, parent_id: str) -> str:
+    """Return folder id for (name, parent_id), creating it on Drive if needed.
+
+    Results are cached in memory and in drive_folders; call
+    find_or_create_folder.cache_clear() to drop the in-memory layer.
+    """
+    _init_cache_tables()
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT folder_id FROM drive_folders WHERE parent_id=:p AND name=:n"),
+            {"p": parent_id, "n": name},
+        ).fetchone()
+        if row:
+            return row[0]
+    folder_id = _find_or_create_folder_impl(name, parent_id)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT OR REPLACE INTO drive_folders (parent_id, name, folder_id, created_at) VALUES (:p, :n, :f, :c)"),
+            {"p": parent_id, "n": name, "f": folder_id, "c": datetime.utcnow().isoformat() + "Z"},
+        )
+    return folder_id
+
+def forget_folder(folder_id: str) -> None:
+    """Drop a folder id from both cache layers (e.g. it was trashed on Drive).
+
+    The in-memory lru_cache cannot evict one key, so it is cleared whole.
+    """
+    _init_cache_tables()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM drive_folders WHERE folder_id=:f"), {"f": folder_id})
+    find_or_create_folder.cache_clear()
+
+# Files above this size go through the resumable protocol so a transient
+# failure retries one chunk instead of the whole body
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+
+class _HashingFile:
+    """Read-through wrapper that feeds each byte to SHA-256 (and MD5) the first time it is read.
+
+    Re-reads of already hashed ranges (upload retries) are not hashed again.
+    MD5 is kept only to compare with Drive's md5Checksum, never for integrity proof.
+    """
+
+    def __init__(self, fd):
+        self._fd = fd
+        self._h = hashlib.sha256()
+        self._md5 = hashlib.md5(usedforsecurity=False)
+        self._done = 0
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._fd.seek(offset, whence)
+
+    def tell(self):
+        return self._fd.tell()
+
+    def read(self, n=-1):
+        pos = self._fd.tell()
+        data = self._fd.read(n)
+        end = pos + len(data)
+        if pos <= self._done < end:
+            fresh = memoryview(data)[self._done - pos:]
+            self._h.update(fresh)
+            self._md5.update(fresh)
+            self._done = end
+        return data
+
+    def _finish(self) -> None:
+        # hash the tail if the upload did not read it (e.g. it failed early)
+        self._fd.seek(self._done)
+        while self.read(1024 * 1024):
+            pass
+
+    def hexdigest(self) -> str:
+        self._finish()
+        return self._h.hexdigest()
+
+    def md5_hexdigest(self) -> str:
+        self._finish()
+        return self._md5.hexdigest()
+
+    def close(self):
+        self._fd.close()
+
+class HashingMediaUpload(MediaIoBaseUpload):
+    """MediaIoBaseUpload that computes SHA-256 while the body is sent.
+
+    Takes a readable, seekable binary file object; close() closes it.
+    """
+
+    def __init__(self, fd, mimetype: str, chunksize: int = 8 * 1024 * 1024, resumable: bool = False):
+        self._hashing = _HashingFile(fd)
+        super().__init__(self._hashing, mimetype, chunksize=chunksize, resumable=resumable)
+
+    def sha256(self) -> str:
+        return self._hashing.hexdigest()
+
+    def md5(self) -> str:
+        return self._hashing.md5_hexdigest()
+
+    def close(self):
+        self._hashing.close()
+
+def _media_for_fd(fd, mime: str) -> HashingMediaUpload:
+    fd.seek(0, os.SEEK_END)
+    size = fd.tell()
+    fd.seek(0)
+    if size <= RESUMABLE_THRESHOLD:
+        return HashingMediaUpload(fd, mime, resumable=False)
+    chunk = 8 * 1024 * 1024 if size < 100 * 1024 * 1024 else 64 * 1024 * 1024
+    return HashingMediaUpload(fd, mime, chunksize=chunk, resumable=True)
+
+def _media_for(local_path: str) -> HashingMediaUpload:
+    return _media_for_fd(open(local_path, "rb"), _guess_mime(local_path))
+
+def _execute_upload(request, media: HashingMediaUpload) -> dict:
+    if not media.resumable():
+        return _execute_with_backoff(request)
+    response = None
+    attempt = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk(num_retries=RETRY_MAX)
+        except HttpError as e:
+            # the session survives: the next call asks Drive how far it got and resumes there
+            attempt += 1
+            if not _is_retryable(e) or attempt >= RETRY_MAX:
+                raise
+            time.sleep((2 ** attempt) + random.random())
+    return response
+
 def upload_file(parent_id: str, local_path: str, target_name: str) -> Dict[str, str]:
     svc = get_service()
-    mime = mimetypes.guess_type(local_path)[0] or "application/octet-stream"
-    media = MediaFileUpload(local_path, mimetype=mime, resumable=False)
+    media = _media_for(local_path)
+    try:
+        body = {"name": target_name, "parents": [parent_id]}
+        request = svc.files().create(body=body, media_body=media, fields="id,webViewLink")
+        f = _execute_upload(request, media)
+        sha256, md5 = media.sha256(), media.md5()
+    finally:
+        media.close()
+    return {"id": f["id"], "webViewLink": f.get("webViewLink"), "sha256": sha256, "md5": md5}
+
+def upload_fileobj(parent_id: str, fh, target_name: str) -> Dict[str, str]:
+    """Upload from an open binary file (e.g. a spooled request body) without a temp copy.
+
+    The body is hashed in the same pass that sends it; fh is left open.
+    """
+    svc = get_service()
+    media = _media_for_fd(fh, _guess_mime(target_name))
     body = {"name": target_name, "parents": [parent_id]}
-    f = svc.files().create(body=body, media_body=media, fields="id,webViewLink").execute()
-    return {"id": f["id"], "webViewLink": f.get("webViewLink")}
+    request = svc.files().create(body=body, media_body=media, fields="id,webViewLink")
+    f = _execute_upload(request, media)
+    return {"id": f["id"], "webViewLink": f.get("webViewLink"), "sha256": media.sha256(), "md5": media.md5()}
 
 def update_file_content(file_id: str, local_path: str) -> Dict[str, str]:
     """Upload new content for existing fileId (creates a new version)."""
     svc = get_service()
-    mime = mimetypes.guess_type(local_path)[0] or "application/octet-stream"
-    media = MediaFileUpload(local_path, mimetype=mime, resumable=False)
-    f = svc.files().update(fileId=file_id, media_body=media, fields="id,webViewLink").execute()
-    return {"id": f["id"], "webViewLink": f.get("webViewLink")}
+    media = _media_for(local_path)
+    try:
+        request = svc.files().update(fileId=file_id, media_body=media, fields="id,webViewLink")
+        f = _execute_upload(request, media)
+        sha256, md5 = media.sha256(), media.md5()
+    finally:
+        media.close()
+    return {"id": f["id"], "webViewLink": f.get("webViewLink"), "sha256": sha256, "md5": md5}
 
-def download_file_content(file_id: str) -> bytes:
+# Larger chunks mean fewer ranged GETs per file (library default is 100 KB)
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+def _download_into(file_id: str, fh) -> None:
     svc = get_service()
     request = svc.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
+    downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
     done = False
     while not done:
-        status, done = downloader.next_chunk()
-    fh.seek(0)
-    return fh.read()
+        status, done = downloader.next_chunk(num_retries=RETRY_MAX)
 
-def get_file_webview_link(file_id: str) -> str | None:
-    svc = get_service()
-    meta = svc.files().get(fileId=file_id, fields="webViewLink").execute()
-    return meta.get("webViewLink")
+class _HashingSink:
+    """Write-only file object: MediaIoBaseDownload writes, the hashers consume.
+
+    With fh set, data is also passed through to that file.
+    """
+
+    def __init__(self, *hashers, fh=None):
+        self._hashers = hashers
+        self._fh = fh
+
+    def write(self, data) -> int:
+        for h in self._hashers:
+            h.update(data)
+        if self._fh is not None:
+            self._fh.write(data)
+        return len(data)
+
+def hash_file_content(file_id: str) -> Tuple[str, str]:
+    """(sha256, md5) of a Drive file in one streamed download."""
+    sha, md5 = hashlib.sha256(), hashlib.md5(usedforsecurity=False)
+    _download_into(file_id, _HashingSink(sha, md5))
+    return sha.hexdigest(), md5.hexdigest()
+
+def stream_file_content(file_id: str, out_path: str) -> Tuple[str, str]:
+    """Download fileId straight to out_path without buffering it in memory.
+
+    Returns (sha256, md5) of the bytes written, hashed in the same pass.
+    """
+    sha, md5 = hashlib.sha256(), hashlib.md5(usedforsecurity=False)
+    with open(out_path, "wb") as fh:
+        _download_into(file_id, _HashingSink(sha, md5, fh=fh))
+    return sha.hexdigest(), md5.hexdigest()
 
 def get_file_name_mime(file_id: str) -> Dict[str, str]:
     svc = get_service()
     meta = svc.files().get(fileId=file_id, fields="name,mimeType").execute()
     return {"name": meta.get("name", ""), "mimeType": meta.get("mimeType", "")}
+
+def get_file_revision(file_id: str) -> Tuple[str | None, str | None]:
+    """(headRevisionId, md5Checksum) from one metadata call; both None for Google-native files."""
+    svc = get_service()
+    meta = svc.files().get(fileId=file_id, fields="headRevisionId,md5Checksum").execute()
+    return meta.get("headRevisionId"), meta.get("md5Checksum")
+
+# Drive batch endpoint accepts at most 100 calls per HTTP request
+BATCH_MAX = 100
+
+def get_files_metadata_batch(ids: List[str], fields: str) -> Dict[str, dict]:
+    """Fetch metadata for many fileIds, up to BATCH_MAX per round-trip.
+
+    Returns {file_id: meta}; ids that failed are absent from the result.
+    """
+    svc = get_service()
+    result: Dict[str, dict] = {}
+
+    def _cb(request_id, response, exception):
+        if exception is None and response is not None:
+            result[request_id] = response
+
+    uniq = list(dict.fromkeys(i for i in ids if i))
+    for start in range(0, len(uniq), BATCH_MAX):
+        batch = svc.new_batch_http_request(callback=_cb)
+        for fid in uniq[start:start + BATCH_MAX]:
+            batch.add(svc.files().get(fileId=fid, fields=fields), request_id=fid)
+        batch.execute()
+    return result
@@ -0,0 +1,193 @@
+"""
+Embed Consilium metadata into PDF, DOCX, ODT, RTF.
+
+Used in-process by the deliver endpoint and by scripts/embed_metadata.py (CLI).
+"""
+import json
+import shutil
+from pathlib import Path
+
+# Soft deps
+try:
+    import pikepdf  # QPDF: metadata-only rewrite, pages untouched
+except Exception:
+    pikepdf = None  # type: ignore
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except Exception:
+    PdfReader = None  # type: ignore
+    PdfWriter = None  # type: ignore
+
+try:
+    import docx  # python-docx
+except Exception:
+    docx = None  # type: ignore
+
+try:
+    from odf.opendocument import load as odf_load, OpenDocumentText
+    from odf import meta
+except Exception:
+    odf_load = None  # type: ignore
+    OpenDocumentText = None  # type: ignore
+    meta = None  # type: ignore
+
+
+def build_keywords_json(doc_id: str, matter_id: str, sha256: str) -> str:
+    return json.dumps({"DocID": doc_id, "MatterID": matter_id, "SHA256": sha256}, ensure_ascii=False)
+
+
+def out_path_for(src: Path, out_dir: Path | None) -> Path:
+    d = out_dir if out_dir else src.parent
+    return d / f"{src.stem}__with_meta{src.suffix}"
+
+
+def embed_pdf(src: Path, dst: Path, title: str | None, doc_id: str, matter_id: str, sha256: str) -> None:
+    if pikepdf is not None:
+        with pikepdf.open(str(src)) as pdf:
+            info = pdf.docinfo
+            info["/Title"] = title or str(info.get("/Title", ""))
+            info["/Subject"] = "Consilium Resolver"
+            info["/Keywords"] = build_keywords_json(doc_id, matter_id, sha256)
+            info["/Producer"] = "Consilium"
+            pdf.save(str(dst))
+        return
+    # Fallback: pypdf copies every page into a new writer
+    if PdfReader is None or PdfWriter is None:
+        raise RuntimeError("pikepdf or pypdf is required")
+    reader = PdfReader(str(src))
+    writer = PdfWriter()
+    for p in reader.pages:
+        writer.add_page(p)
+    info = reader.metadata or {}
+    meta_dict = {
+        "/Title": title or info.get("/Title", ""),
+        "/Subject": "Consilium Resolver",
+        "/Keywords": build_keywords_json(doc_id, matter_id, sha256),
+        "/Producer": "Consilium",
+    }
+    writer.add_metadata(meta_dict)
+    with dst.open("wb") as f:
+        writer.write(f)
+
+
+def embed_docx(src: Path, dst: Path, title: str | None, doc_id: str, matter_id: str, sha256: str) -> None:
+    if docx is None:
+        raise RuntimeError("python-docx is not installed")
+    doc = docx.Document(str(src))
+    cp = doc.core_properties
+    if title:
+        cp.title = title
+    # Place structured data in keywords as JSON, human label in subject
+    cp.subject = "Consilium Resolver"
+    cp.keywords = build_keywords_json(doc_id, matter_id, sha256)
+    doc.save(str(dst))
+
+
+def embed_odt(src: Path, dst: Path, title: str | None, doc_id: str, matter_id: str, sha256: str) -> None:
+    if odf_load is None or meta is None:
+        raise RuntimeError("odfpy is not installed")
+    doc = odf_load(str(src))
+    # Use UserDefined meta fields for broad compatibility
+    try:
+        if title:
+            doc.meta.addElement(meta.UserDefined(name="Title", valuetype="string", text=title))
+        doc.meta.addElement(meta.UserDefined(name="Consilium", valuetype="string", text="Resolver"))
+        doc.meta.addElement(
+            meta.UserDefined(
+                name="ConsiliumKeywords",
+                valuetype="string",
+                text=build_keywords_json(doc_id, matter_id, sha256),
+            )
+        )
+    except Exception:
+        # As a fallback, do not fail the whole operation; just proceed with saving
+        pass
+    doc.save(str(dst))
+
+
+RTF_CHUNK = 64 * 1024
+
+
+def _find_bytes(f, needle: bytes) -> int:
+    """Offset of the first needle in binary file f (scanned in chunks), or -1."""
+    f.seek(0)
+    offset, tail = 0, b""
+    while chunk := f.read(RTF_CHUNK):
+        buf = tail + chunk
+        i = buf.find(needle)
+        if i != -1:
+            return offset - len(tail) + i
+        tail = buf[-(len(needle) - 1):] if len(needle) > 1 else b""
+        offset += len(chunk)
+    return -1
+
+
+def _copy_n(fin, fout, n: int) -> None:
+    while n > 0:
+        chunk = fin.read(min(RTF_CHUNK, n))
+        if not chunk:
+            break
+        fout.write(chunk)
+        n -= len(chunk)
+
+
+def embed_rtf(src: Path, dst: Path, title: str | None, doc_id: str, matter_id: str, sha256: str) -> None:
+    # Minimalistic approach: ensure an \info group with \title and \doccomm JSON.
+    # Bytes are streamed around the insertion point, never decoded or held whole.
+    info_json = build_keywords_json(doc_id, matter_id, sha256)
+    title_part = title or ""
+    info_block = f"\\info\\title {title_part} \\doccomm {info_json} ".encode("utf-8")
+    with src.open("rb") as fin, dst.open("wb") as fout:
+        at = _find_bytes(fin, b"\\info")
+        if at != -1:
+            # append our fields into the existing info block
+            at += len(b"\\info")
+        else:
+            fin.seek(0)
+            if fin.read(5) == b"{\\rtf":
+                # insert at start after {\rtf...
+                at = _find_bytes(fin, b" ")
+                if at == -1:
+                    fin.seek(0)
+                    shutil.copyfileobj(fin, fout, RTF_CHUNK)
+                    fout.write(b"{" + info_block + b"}")
+                    return
+            else:
+                fout.write(b"{\\rtf1 " + info_block + b"}")
+                fin.seek(0)
+                shutil.copyfileobj(fin, fout, RTF_CHUNK)
+                return
+        fin.seek(0)
+        _copy_n(fin, fout, at)
+        fout.write(b" " + info_block)
+        shutil.copyfileobj(fin, fout, RTF_CHUNK)
+
+
+EMBEDDERS = {
+    "pdf": embed_pdf,
+    "docx": embed_docx,
+    "odt": embed_odt,
+    "rtf": embed_rtf,
+}
+
+
+def embed(
+    in_path: Path,
+    doc_id: str,
+    matter_id: str,
+    sha256: str,
+    title: str | None = None,
+    out_dir: Path | None = None,
+) -> Path:
+    """Write <name>__with_meta.<ext> next to in_path (or in out_dir) and return its path.
+
+    Raises ValueError for unsupported extensions.
+    """
+    ext = in_path.suffix.lower().lstrip(".")
+    embedder = EMBEDDERS.get(ext)
+    if embedder is None:
+        raise ValueError(f"Unsupported extension: .{ext}")
+    dst = out_path_for(in_path, out_dir)
+    embedder(in_path, dst, title, doc_id, matter_id, sha256)
+    return dst
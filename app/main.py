@@ -1,9 +1,23 @@
 def _ensure_unique_docid_index() -> None:
     """Create UNIQUE index on docs.doc_id if missing (SQLite)."""
-    with engine.connect() as conn:
+    with engine.begin() as conn:
         # Create unique index if not exists
         conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uidx_docs_doc_id ON docs(doc_id)"))
-        conn.commit()
+
+# Indexes shaped like the admin listing: optional equality filter, then the sort key
+_DOCS_LIST_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_docs_updated_id ON docs(updated_at DESC, doc_id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_docs_matter_updated ON docs(matter_id, updated_at DESC, doc_id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_docs_status_updated ON docs(status, updated_at DESC, doc_id DESC)",
+    # both filters at once; matter-only pages still need ix_docs_matter_updated for the order
+    "CREATE INDEX IF NOT EXISTS ix_docs_matter_status_updated ON docs(matter_id, status, updated_at DESC, doc_id DESC)",
+)
+
+def _ensure_docs_list_indexes() -> None:
+    """Indexes matching the admin listing filters and order, so pages skip the filesort."""
+    with engine.begin() as conn:
+        for ddl in _DOCS_LIST_INDEXES:
+            conn.execute(text(ddl))
 
 # Helpers
 def _is_audio(filename: str | None, content_type: str | None) -> bool:
@@ -30,31 +44,111 @@ ALLOWED_CONTENT_TYPES = {
     "audio/mpeg",  # mp3
 }
 ALLOWED_EXTS = {".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".wav", ".mp3"}
+# Read/hash uploads in 4 MiB chunks: fewer awaits/syscalls per file
+UPLOAD_READ_CHUNK = 4 * 1024 * 1024
+
+# Magic-byte sniffing: the first 512 bytes are enough for every accepted format
+SNIFF_BYTES = 512
+
+
+# UTF-32 first: its little-endian BOM starts with the UTF-16LE one
+_TEXT_BOMS = (b"\xff\xfe\x00\x00", b"\x00\x00\xfe\xff", b"\xff\xfe", b"\xfe\xff")
+
+
+def _sniff_mime(head: bytes) -> str | None:
+    """Content type of an accepted format judged by its leading bytes; None if none match."""
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head.startswith(_TEXT_BOMS):
+        # before the mp3 check: the UTF-16LE BOM also looks like an MPEG frame sync
+        return "text/plain"
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "audio/mpeg"
+    if head.startswith(b"PK\x03\x04"):
+        # docx is the only zip container we accept
+        return "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    if head and b"\x00" not in head:
+        # binary formats carry NULs early; no encoding check so cp1251 text passes too
+        return "text/plain"
+    return None
+
+
+# Extensions each sniffed type may travel under; the NUL-free text guess is only trusted for .txt
+_SNIFFED_EXTS = {
+    "application/pdf": {".pdf"},
+    "image/png": {".png"},
+    "image/jpeg": {".jpg", ".jpeg"},
+    "audio/wav": {".wav"},
+    "audio/mpeg": {".mp3"},
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": {".docx"},
+    "text/plain": {".txt"},
+}
+
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import RedirectResponse, JSONResponse
+def _content_matches(head: bytes, ext: str | None, content_type: str | None) -> bool:
+    """True when the leading bytes agree with the file extension and declared content type.
+
+    An empty file has nothing to contradict its labels and is accepted.
+    """
+    if not head:
+        return True
+    sniffed = _sniff_mime(head)
+    if sniffed is None:
+        return False
+    ext = (ext or "").lower()
+    # no extension: a text guess stands unless a declared type below contradicts it
+    if ext and ext not in _SNIFFED_EXTS[sniffed]:
+        return False
+    ctype = (content_type or "").split(";", 1)[0].strip().lower()
+    if ctype == "audio/x-wav":
+        ctype = "audio/wav"
+    # generic labels (octet-stream from a file server) say nothing either way
+    if ctype in ALLOWED_CONTENT_TYPES and ctype != sniffed:
+        return False
+    return True
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, BackgroundTasks
+from fastapi.responses import RedirectResponse, ORJSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import select, desc, update
+from sqlalchemy import select, desc, update, and_, or_, func, literal_column
 from pathlib import Path
 import tempfile
 import os
 import json
+import orjson
+import queue
 from datetime import datetime
 import asyncio
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import threading
 from typing import Optional, Dict, List
 import base64
+import hashlib
 import mimetypes
+import re
 import requests
 import subprocess
-import sys
-from sqlalchemy import text
+from sqlalchemy import text, bindparam, event
+from sqlalchemy.exc import SQLAlchemyError
+from googleapiclient.errors import HttpError
+import httpx
 import shutil
+import ssl
 
 from .db import Base, engine, SessionLocal
 from .models import Doc, Matter
-from .resolver import generate_doc_id, compute_sha256, build_permalink
+from .resolver import generate_doc_id, build_permalink
 from .config import (
     GDRIVE_ROOT_FOLDER_ID,
     GDRIVE_ROOT_PATH,
@@ -72,6 +166,7 @@ from .config import (
     INTEGRITY_INTERVAL_MIN,
     INTEGRITY_BATCH,
     INTEGRITY_INCLUDE_STATUSES,
+    INTEGRITY_CONCURRENCY,
     EMBED_MODE,
     EMBED_OUT_FOLDER,
     EMBED_ON_DELIVER,
@@ -80,16 +175,43 @@ from .config import (
     OCR_LANGS,
     OCR_DPI,
     OCR_MAX_PAGES,
+    OCR_PROCESSES,
+    OCR_CONCURRENCY,
+    OCR_FORMAT,
     DEBUG_OCR,
 )
 from . import drive as gdrive
+from . import embed_metadata
 from .notifier_email import send_email
 from .notifier_matrix import send_matrix_message
 
 
-app = FastAPI(title="Consilium Resolver", version="0.1.0")
+app = FastAPI(title="Consilium Resolver", version="0.1.0", default_response_class=ORJSONResponse)
+# OCR text (mostly Cyrillic) compresses ~4x; small redirects/JSON stay uncompressed
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 templates = Jinja2Templates(directory="templates")
 
+# SQLite tuning for every pooled connection: WAL lets readers run alongside the
+# single writer (OCR/integrity workers vs. request handlers)
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record) -> None:
+        cur = dbapi_conn.cursor()
+        for pragma in _SQLITE_PRAGMAS:
+            cur.execute(pragma)
+        cur.close()
+
+    # connections pooled before the hook existed would miss the per-connection pragmas
+    engine.dispose()
+
 # Auto-migrate (create tables)
 Base.metadata.create_all(bind=engine)
 
@@ -114,17 +236,67 @@ class DocassembleHook(BaseModel):
     origin_meta: dict | list | None = None
 
 # --- Lightweight migrations for SQLite (idempotent) ---
-def _add_column_if_missing(table: str, column: str, decl: str) -> None:
-    from sqlalchemy import text
-    with engine.connect() as conn:
-        info = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
-        cols = {row[1] for row in info}
-        if column not in cols:
-            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {decl}"))
+_EXTRA_COLUMNS = {
+    "matters": [
+        ("client_name", "TEXT"),
+        ("status", "TEXT"),
+        ("tags", "JSON"),
+        ("folder_path", "TEXT"),
+        ("created_at", "DATETIME"),
+        ("updated_at", "DATETIME"),
+        ("intake_folder_id", "TEXT"),
+    ],
+    "docs": [
+        ("origin", "TEXT"),
+        ("origin_meta", "JSON"),
+        ("owner", "TEXT"),
+        ("status", "TEXT"),
+        ("tags", "JSON"),
+        ("updated_at", "DATETIME"),
+        ("gdrive_revision_id", "TEXT"),
+        ("md5_plain", "TEXT"),
+    ],
+}
+
+
+def _add_missing_columns(spec: Dict[str, List[tuple]]) -> None:
+    """One connection, one PRAGMA per table, all ALTERs in a single transaction."""
+    altered = False
+    with engine.begin() as conn:
+        for table, columns in spec.items():
+            info = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+            cols = {row[1] for row in info}
+            for column, decl in columns:
+                if column not in cols:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {decl}"))
+                    altered = True
+    if altered:
+        _sqlite_optimize()
+
+
+# Planner statistics: 0x10002 on a fresh connection also analyzes tables that
+# never had stats; the periodic plain run only refreshes what has drifted.
+SQLITE_OPTIMIZE_INTERVAL_SEC = 3 * 3600
+
+
+def _sqlite_optimize(mask: str = "") -> None:
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"PRAGMA optimize{mask}"))
+
+
+async def _optimize_worker():
+    while True:
+        await asyncio.sleep(SQLITE_OPTIMIZE_INTERVAL_SEC)
+        try:
+            await asyncio.to_thread(_sqlite_optimize)
+        except Exception:
+            pass
 
 # --- C2.1: Lightweight Jobs table (for OCR queue) ---
 def _init_jobs_table() -> None:
-    with engine.connect() as conn:
+    with engine.begin() as conn:
         conn.execute(text(
             """
             CREATE TABLE IF NOT EXISTS jobs (
@@ -138,25 +310,47 @@ def _init_jobs_table() -> None:
             )
             """
         ))
-        conn.commit()
+        # the OCR worker's "next pending job of type T" poll is an index seek
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_type_status_id ON jobs(type, status, id)"))
 
 _init_jobs_table()
 
-# Add new columns for matters
-_add_column_if_missing("matters", "client_name", "TEXT")
-_add_column_if_missing("matters", "status", "TEXT")
-_add_column_if_missing("matters", "tags", "JSON")
-_add_column_if_missing("matters", "folder_path", "TEXT")
-_add_column_if_missing("matters", "created_at", "DATETIME")
-_add_column_if_missing("matters", "updated_at", "DATETIME")
 
-# Add new columns for docs
-_add_column_if_missing("docs", "origin", "TEXT")
-_add_column_if_missing("docs", "origin_meta", "JSON")
-_add_column_if_missing("docs", "owner", "TEXT")
-_add_column_if_missing("docs", "status", "TEXT")
-_add_column_if_missing("docs", "tags", "JSON")
-_add_column_if_missing("docs", "updated_at", "DATETIME")
+# Last background "Sync SHA" outcome per doc, shown next to the row in /admin/docs
+def _init_sync_jobs_table() -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            """
+            CREATE TABLE IF NOT EXISTS sync_jobs (
+                doc_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                result JSON,
+                updated_at DATETIME
+            )
+            """
+        ))
+
+_init_sync_jobs_table()
+
+# OCR output by content hash and mode: re-enqueued or duplicate files skip the pipeline
+def _init_ocr_cache_table() -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                sha256 TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                text TEXT,
+                info JSON,
+                created_at DATETIME,
+                PRIMARY KEY (sha256, mode)
+            )
+            """
+        ))
+
+_init_ocr_cache_table()
+
+_add_missing_columns(_EXTRA_COLUMNS)
 
 
 # --- B1: Integrity report (background verify + endpoint) ---
@@ -169,43 +363,169 @@ def _integrity_statuses() -> List[str]:
     return [s.strip() for s in INTEGRITY_INCLUDE_STATUSES.split(",") if s.strip()]
 
 
-def _write_integrity_record(rec: dict) -> None:
+def _write_integrity_records(recs: List[dict]) -> None:
+    if not recs:
+        return
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
-    with INTEGRITY_REPORT_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    with INTEGRITY_REPORT_PATH.open("ab") as f:
+        f.writelines(orjson.dumps(rec) + b"\n" for rec in recs)
+        # audit log: one flush + fsync per batch, not per record
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Latest integrity result per doc_id; the JSONL file stays as the audit log
+def _init_integrity_table() -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            """
+            CREATE TABLE IF NOT EXISTS doc_integrity (
+                doc_id TEXT PRIMARY KEY,
+                matter_id TEXT,
+                status TEXT,
+                ts TEXT,
+                match BOOLEAN,
+                sha256_current TEXT,
+                sha256_stored TEXT,
+                error TEXT
+            )
+            """
+        ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_doc_integrity_ts ON doc_integrity(ts)"))
+
+_init_integrity_table()
+
+
+def _integrity_params(rec: dict) -> dict:
+    res = rec.get("result") or {}
+    return {
+        "doc_id": rec["doc_id"],
+        "matter_id": rec.get("matter_id"),
+        "status": rec.get("status"),
+        "ts": rec.get("ts"),
+        "match": res.get("match") if res else None,
+        "cur": res.get("sha256_current"),
+        "stored": res.get("sha256_stored"),
+        "error": rec.get("error"),
+    }
+
+
+def _upsert_integrity_records(recs: List[dict]) -> None:
+    """Upsert a whole batch in one executemany and one transaction."""
+    if not recs:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT OR REPLACE INTO doc_integrity "
+                "(doc_id, matter_id, status, ts, match, sha256_current, sha256_stored, error) "
+                "VALUES (:doc_id, :matter_id, :status, :ts, :match, :cur, :stored, :error)"
+            ),
+            [_integrity_params(rec) for rec in recs],
+        )
+
+
+def _integrity_row_to_record(r) -> dict:
+    rec = {"ts": r.ts, "doc_id": r.doc_id, "matter_id": r.matter_id, "status": r.status}
+    if r.error is not None:
+        rec["error"] = r.error
+    else:
+        rec["result"] = {
+            "match": bool(r.match),
+            "sha256_current": r.sha256_current,
+            "sha256_stored": r.sha256_stored,
+        }
+    return rec
+
+
+def _set_doc_md5(db: Session, doc_id: str, md5: str | None) -> None:
+    # md5_plain is not on the Doc model; it only mirrors Drive's md5Checksum
+    db.execute(text("UPDATE docs SET md5_plain=:m WHERE doc_id=:d"), {"m": md5, "d": doc_id})
+
+
+def _backfill_doc_md5(pairs: List[tuple]) -> None:
+    if not pairs:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE docs SET md5_plain=:m WHERE doc_id=:d"),
+            [{"d": d, "m": m} for d, m in pairs],
+        )
+
+
+_INTEGRITY_COLUMNS = (Doc.doc_id, Doc.matter_id, Doc.status, Doc.storage, Doc.storage_ref, Doc.sha256_plain)
 
 
 async def _run_integrity_batch() -> int:
     """Verify a batch of docs and write JSONL records. Returns number processed."""
-    count = 0
     statuses = _integrity_statuses()
-    with SessionLocal() as db:
-        q = select(Doc).where(Doc.status.in_(statuses)).limit(INTEGRITY_BATCH)
-        rows = db.execute(q).scalars().all()
-        for row in rows:
-            rec = {
-                "ts": datetime.utcnow().isoformat() + "Z",
-                "doc_id": row.doc_id,
-                "matter_id": row.matter_id,
-                "status": row.status,
-            }
-            try:
-                if row.storage != "gdrive" or not row.storage_ref:
-                    raise RuntimeError("Unsupported storage or missing ref")
-                content = gdrive.download_file_content(row.storage_ref)
-                import hashlib
-                h = hashlib.sha256(); h.update(content)
-                current = h.hexdigest()
+    # cap concurrent downloads to stay within Drive per-user quota
+    sem = asyncio.Semaphore(max(1, INTEGRITY_CONCURRENCY))
+
+    async def _check(row) -> dict:
+        rec = {
+            "ts": datetime.utcnow().isoformat() + "Z",
+            "doc_id": row.doc_id,
+            "matter_id": row.matter_id,
+            "status": row.status,
+        }
+        try:
+            if row.storage != "gdrive" or not row.storage_ref:
+                raise RuntimeError("Unsupported storage or missing ref")
+            # happy path: Drive's md5Checksum equals the md5 recorded with the stored
+            # SHA-256, so the bytes are unchanged and nothing needs downloading
+            drive_md5 = drive_md5_by_ref.get(row.storage_ref)
+            known_md5 = md5_by_doc.get(row.doc_id)
+            if drive_md5 and known_md5 and drive_md5 == known_md5:
                 rec["result"] = {
-                    "match": bool(current == row.sha256_plain),
-                    "sha256_current": current,
+                    "match": True,
+                    "sha256_current": row.sha256_plain,
                     "sha256_stored": row.sha256_plain,
+                    "via": "md5",
                 }
-            except Exception as e:
-                rec["error"] = str(e)
-            _write_integrity_record(rec)
-            count += 1
-    return count
+                return rec
+            async with sem:
+                current, md5 = await asyncio.to_thread(gdrive.hash_file_content, row.storage_ref)
+            match = bool(current == row.sha256_plain)
+            rec["result"] = {
+                "match": match,
+                "sha256_current": current,
+                "sha256_stored": row.sha256_plain,
+            }
+            if match and md5 != known_md5:
+                # remember the md5 of the verified bytes so the next pass can skip them
+                md5_backfill.append((row.doc_id, md5))
+        except Exception as e:
+            rec["error"] = str(e)
+        return rec
+
+    with SessionLocal() as db:
+        # only what the check reads: origin_meta (OCR text) and tags stay in SQLite;
+        # md5_plain is a raw-DDL column, not mapped on Doc
+        q = (
+            select(*_INTEGRITY_COLUMNS, literal_column("docs.md5_plain").label("md5_plain"))
+            .where(Doc.status.in_(statuses))
+            .limit(INTEGRITY_BATCH)
+        )
+        rows = db.execute(q).all()
+    md5_by_doc = {r.doc_id: r.md5_plain for r in rows}
+    md5_backfill: List[tuple] = []
+    # every checksum of the batch in one batched metadata request, not a call per doc
+    refs = [r.storage_ref for r in rows if r.storage == "gdrive" and r.storage_ref]
+    try:
+        metas = await asyncio.to_thread(gdrive.get_files_metadata_batch, refs, "md5Checksum")
+    except Exception as e:
+        print(f"[integrity] md5 batch lookup failed, hashing downloads instead: {e!r}")
+        metas = {}
+    drive_md5_by_ref = {ref: meta.get("md5Checksum") for ref, meta in metas.items()}
+    # plain rows, detached from the session: don't pin a pooled connection for
+    # the minutes the streamed downloads can take
+    recs = list(await asyncio.gather(*(_check(row) for row in rows)))
+    # the fsync'd append and the upsert are blocking too; keep the loop free
+    await asyncio.to_thread(_write_integrity_records, recs)
+    await asyncio.to_thread(_upsert_integrity_records, recs)
+    await asyncio.to_thread(_backfill_doc_md5, md5_backfill)
+    return len(recs)
 
 
 async def _integrity_worker():
@@ -221,147 +541,303 @@ async def _integrity_worker():
 
 
 # --- C2.1: OCR worker (skeleton) ---
+# Set whenever an OCR job is written; the worker waits on it instead of polling
+_ocr_wakeup: asyncio.Event | None = None
+_ocr_loop: asyncio.AbstractEventLoop | None = None
+OCR_IDLE_RECHECK_SEC = 60  # safety net for jobs written by another process
+
+
+def _wake_ocr_worker() -> None:
+    """Thread-safe nudge for _ocr_worker; a no-op before the worker has started."""
+    if _ocr_wakeup is not None and _ocr_loop is not None:
+        _ocr_loop.call_soon_threadsafe(_ocr_wakeup.set)
+
+
 def _enqueue_job(job_type: str, payload: dict) -> int:
     now = datetime.utcnow().isoformat() + "Z"
-    with engine.connect() as conn:
-        res = conn.execute(
-            text("INSERT INTO jobs (type, payload, status, attempts, created_at, updated_at) VALUES (:t, :p, 'pending', 0, :c, :u)"),
-            {"t": job_type, "p": json.dumps(payload, ensure_ascii=False), "c": now, "u": now},
-        )
-        conn.commit()
-        return res.lastrowid if hasattr(res, "lastrowid") else 0
+    with engine.begin() as conn:
+        jid = conn.execute(
+            text(
+                "INSERT INTO jobs (type, payload, status, attempts, created_at, updated_at) "
+                "VALUES (:t, :p, 'pending', 0, :c, :u) RETURNING id"
+            ),
+            {"t": job_type, "p": orjson.dumps(payload).decode(), "c": now, "u": now},
+        ).scalar_one()
+    if job_type == "ocr":
+        _wake_ocr_worker()
+    return jid
 
 
 def _take_next_job(job_type: str) -> dict | None:
-    with engine.connect() as conn:
+    # claim and fetch in one statement, so two workers can never take the same job
+    with engine.begin() as conn:
         row = conn.execute(
-            text("SELECT id, payload, attempts FROM jobs WHERE type=:t AND status='pending' ORDER BY id ASC LIMIT 1"),
-            {"t": job_type},
+            text(
+                """
+                UPDATE jobs SET status='processing', attempts=COALESCE(attempts, 0) + 1, updated_at=:u
+                WHERE id = (
+                    SELECT id FROM jobs WHERE type=:t AND status='pending' ORDER BY id ASC LIMIT 1
+                )
+                RETURNING id, payload
+                """
+            ),
+            {"t": job_type, "u": datetime.utcnow().isoformat() + "Z"},
         ).fetchone()
-        if not row:
-            return None
-        jid = row[0]
-        attempts = int(row[2] or 0)
-        conn.execute(
-            text("UPDATE jobs SET status='processing', attempts=:a, updated_at=:u WHERE id=:id"),
-            {"a": attempts + 1, "u": datetime.utcnow().isoformat() + "Z", "id": jid},
-        )
-        conn.commit()
-        try:
-            payload = json.loads(row[1] or "{}")
-        except Exception:
-            payload = {}
-        return {"id": jid, "payload": payload}
+    if not row:
+        return None
+    try:
+        payload = orjson.loads(row[1] or "{}")
+    except Exception:
+        payload = {}
+    return {"id": row[0], "payload": payload}
 
 
 def _finish_job(job_id: int, status: str) -> None:
-    with engine.connect() as conn:
+    with engine.begin() as conn:
         conn.execute(
             text("UPDATE jobs SET status=:s, updated_at=:u WHERE id=:id"),
             {"s": status, "u": datetime.utcnow().isoformat() + "Z", "id": job_id},
         )
-        conn.commit()
+
+
+# (doc_id, mode) -> (expires_at, job_id) of OCR jobs enqueued by this process, so a
+# double click doesn't queue a second multi-minute run. Cleared when the job finishes.
+OCR_DEDUP_TTL = 60.0
+_ocr_recent: Dict[tuple, tuple] = {}
+_ocr_recent_lock = threading.Lock()
+
+
+def _recent_ocr_job(doc_id: str, mode: str) -> int | None:
+    hit = _ocr_recent.get((doc_id, mode))
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    return None
+
+
+def _enqueue_ocr_once(doc_id: str, mode: str) -> tuple[int, bool]:
+    """(job_id, deduplicated): reuse a job enqueued within OCR_DEDUP_TTL."""
+    with _ocr_recent_lock:
+        jid = _recent_ocr_job(doc_id, mode)
+        if jid is not None:
+            return jid, True
+        jid = _enqueue_job("ocr", {"doc_id": doc_id, "mode": mode})
+        now = time.monotonic()
+        for k in [k for k, v in _ocr_recent.items() if v[0] <= now]:
+            del _ocr_recent[k]
+        _ocr_recent[(doc_id, mode)] = (now + OCR_DEDUP_TTL, jid)
+        return jid, False
+
+
+def _forget_ocr_job(doc_id: str | None, mode: str, jid: int) -> None:
+    with _ocr_recent_lock:
+        hit = _ocr_recent.get((doc_id, mode))
+        if hit and hit[1] == jid:
+            del _ocr_recent[(doc_id, mode)]
+
+
+_ocr_pool: ProcessPoolExecutor | None = None
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    # created on first job; worker processes are spawned on demand up to OCR_PROCESSES
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ProcessPoolExecutor(max_workers=OCR_PROCESSES, initializer=_ocr_worker_init)
+    return _ocr_pool
+
+
+def _reset_ocr_pool(pool: ProcessPoolExecutor) -> None:
+    # a broken pool never recovers; the next job gets a fresh one
+    global _ocr_pool
+    if _ocr_pool is pool:
+        _ocr_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _ocr_cache_get(sha256: str, mode: str) -> tuple[str, dict] | None:
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT text, info FROM ocr_cache WHERE sha256 = :s AND mode = :m"),
+            {"s": sha256, "m": mode},
+        ).first()
+    if not row:
+        return None
+    return row[0] or "", orjson.loads(row[1] or "{}")
+
+
+def _ocr_cache_put(sha256: str, mode: str, text_out: str, info: dict) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT OR REPLACE INTO ocr_cache (sha256, mode, text, info, created_at) VALUES (:s, :m, :t, :i, :c)"),
+            {"s": sha256, "m": mode, "t": text_out, "i": orjson.dumps(info).decode(), "c": datetime.utcnow()},
+        )
 
 
 async def _ocr_worker():
+    global _ocr_wakeup, _ocr_loop
+    _ocr_wakeup = asyncio.Event()
+    _ocr_loop = asyncio.get_running_loop()
+    # one slot per OCR process: pending jobs fan out across the pool
+    slots = asyncio.Semaphore(OCR_PROCESSES)
     while True:
+        await slots.acquire()
         try:
             job = _take_next_job("ocr")
-            if not job:
-                await asyncio.sleep(2)
-                continue
-            jid = int(job["id"])
-            payload = job.get("payload") or {}
-            doc_id = payload.get("doc_id")
-            mode = (payload.get("mode") or "auto").lower()
+        except Exception:
+            job = None
+        if not job:
+            slots.release()
             try:
-                print(f"[ocr] start jid={jid} payload={payload}")
-            except Exception:
+                await asyncio.wait_for(_ocr_wakeup.wait(), timeout=OCR_IDLE_RECHECK_SEC)
+            except asyncio.TimeoutError:
                 pass
-            if not doc_id:
+            _ocr_wakeup.clear()
+            continue
+        task = asyncio.create_task(_ocr_job(job))
+        task.add_done_callback(lambda _t: slots.release())
+
+
+async def _ocr_job(job: dict) -> None:
+    jid = int(job["id"])
+    payload = job.get("payload") or {}
+    try:
+        await _run_ocr_job(jid, payload)
+    except Exception:
+        # не роняем воркер; задача не должна зависнуть в processing
+        try:
+            _finish_job(jid, "failed")
+        except Exception:
+            pass
+    finally:
+        # a new enqueue for this doc should run again, not dedup onto a finished job
+        _forget_ocr_job(payload.get("doc_id"), (payload.get("mode") or "auto").lower(), jid)
+
+
+async def _run_ocr_job(jid: int, payload: dict) -> None:
+    doc_id = payload.get("doc_id")
+    mode = (payload.get("mode") or "auto").lower()
+    try:
+        print(f"[ocr] start jid={jid} payload={payload}")
+    except Exception:
+        pass
+    if not doc_id:
+        _finish_job(jid, "failed")
+        return
+    # Real OCR: скачать файл из Drive, распознать, сохранить текст в origin_meta.ocr_text
+    with SessionLocal() as db:
+        ref = db.execute(select(Doc.storage_ref, Doc.title).where(Doc.doc_id == doc_id)).first()
+    if not ref or not ref.storage_ref:
+        _finish_job(jid, "failed")
+        return
+    # 1) Определяем тип по имени
+    try:
+        nm = (await asyncio.to_thread(gdrive.get_file_name_mime, ref.storage_ref)).get("name", "")
+    except Exception:
+        nm = ref.title or "document"
+    # 2) Скачиваем содержимое на диск, хешируя на лету; the pool process reads
+    # the file itself, so the parent never holds (or pickles) the whole body
+    with tempfile.TemporaryDirectory() as td:
+        src_path = str(Path(td) / "source")
+        try:
+            content_sha, _ = await asyncio.to_thread(gdrive.stream_file_content, ref.storage_ref, src_path)
+        except Exception:
+            _finish_job(jid, "failed")
+            return
+        cached = await asyncio.to_thread(_ocr_cache_get, content_sha, mode)
+        if cached:
+            text_out, ocr_info = cached
+        else:
+            # CPU- and subprocess-heavy; runs in a worker process, off the event loop
+            pool = _get_ocr_pool()
+            try:
+                text_out, ocr_info = await _ocr_loop.run_in_executor(
+                    pool, _run_ocr_pipeline, src_path, nm, mode
+                )
+            except BrokenProcessPool:
+                _reset_ocr_pool(pool)
                 _finish_job(jid, "failed")
-                continue
-            # Real OCR: скачать файл из Drive, распознать, сохранить текст в origin_meta.ocr_text
-            with SessionLocal() as db:
-                row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
-                if not row or not row.storage_ref:
-                    _finish_job(jid, "failed")
-                    continue
-                # 1) Скачиваем содержимое
+                return
+            # failures are not cached: a later run may have the tools or a fixed file
+            if ocr_info.get("ok"):
                 try:
-                    content = gdrive.download_file_content(row.storage_ref)
-                except Exception:
-                    _finish_job(jid, "failed")
-                    continue
-                # 2) Определяем тип по имени
-                try:
-                    nm = gdrive.get_file_name_mime(row.storage_ref).get("name", "")
-                except Exception:
-                    nm = row.title or "document"
-                text_out, ocr_info = _run_ocr_pipeline(content, nm, mode)
-                # 3) Тримминг длинных
-                truncated = False
-                max_len = 2 * 1024 * 1024  # 2MB
-                if isinstance(text_out, bytes):
-                    try:
-                        text_out = text_out.decode("utf-8", errors="replace")
-                    except Exception:
-                        text_out = ""
-                if len(text_out) > max_len:
-                    text_out = text_out[:max_len] + "\n[truncated]"
-                    truncated = True
-                # 4) Сохраняем в origin_meta и теги
-                meta = row.origin_meta or {}
-                if isinstance(meta, list):
-                    meta = {"note": "; ".join(str(x) for x in meta)}
-                meta["ocr_text"] = text_out
-                meta["ocr_info"] = {
-                    "tool": ocr_info.get("tool"),
-                    "code": ocr_info.get("code"),
-                    "error": ocr_info.get("error"),
-                    "truncated": truncated,
-                    "mode": (ocr_info.get("mode") or mode),
-                }
-                if DEBUG_OCR:
-                    try:
-                        print(f"[ocr] save doc_id={doc_id} tool={meta['ocr_info']['tool']} mode={meta['ocr_info'].get('mode')} text_len={len(text_out)}")
-                    except Exception:
-                        pass
-                row.origin_meta = meta
-                tags = row.tags or []
-                if isinstance(tags, dict):
-                    tags = [f"k:{k}={v}" for k, v in tags.items()]
-                tags = [t for t in tags if t != "ocr:queued"]
-                if ocr_info.get("ok"):
-                    if "ocr:done" not in tags:
-                        tags.append("ocr:done")
-                else:
-                    if "ocr:failed" not in tags:
-                        tags.append("ocr:failed")
-                row.tags = tags
-                row.updated_at = datetime.utcnow()
-                db.add(row)
-                # Also update any other rows with same doc_id (in case of duplicates)
-                try:
-                    db.execute(
-                        update(Doc)
-                        .where(Doc.doc_id == doc_id)
-                        .values(origin_meta=meta, tags=tags, updated_at=datetime.utcnow())
-                    )
-                except Exception:
+                    await asyncio.to_thread(_ocr_cache_put, content_sha, mode, text_out, ocr_info)
+                except SQLAlchemyError:
                     pass
-                db.commit()
-                _finish_job(jid, "done" if ocr_info.get("ok") else "failed")
+    # 3) Тримминг длинных
+    truncated = False
+    max_len = 2 * 1024 * 1024  # 2MB
+    if isinstance(text_out, bytes):
+        try:
+            text_out = text_out.decode("utf-8", errors="replace")
         except Exception:
-            # не роняем цикл воркера
-            await asyncio.sleep(2)
+            text_out = ""
+    if len(text_out) > max_len:
+        text_out = text_out[:max_len] + "\n[truncated]"
+        truncated = True
+    # 4) Сохраняем в origin_meta и теги
+    with SessionLocal() as db:
+        row = db.get(Doc, doc_id)
+        if not row:
+            _finish_job(jid, "failed")
+            return
+        meta = row.origin_meta or {}
+        if isinstance(meta, list):
+            meta = {"note": "; ".join(str(x) for x in meta)}
+        else:
+            # a new dict: an in-place edit of the loaded JSON value is not seen as a change
+            meta = dict(meta)
+        meta["ocr_text"] = text_out
+        meta["ocr_info"] = {
+            "tool": ocr_info.get("tool"),
+            "code": ocr_info.get("code"),
+            "error": ocr_info.get("error"),
+            "truncated": truncated,
+            "mode": (ocr_info.get("mode") or mode),
+        }
+        if DEBUG_OCR:
+            try:
+                print(f"[ocr] save doc_id={doc_id} tool={meta['ocr_info']['tool']} mode={meta['ocr_info'].get('mode')} text_len={len(text_out)}")
+            except Exception:
+                pass
+        row.origin_meta = meta
+        tags = row.tags or []
+        if isinstance(tags, dict):
+            tags = [f"k:{k}={v}" for k, v in tags.items()]
+        tags = [t for t in tags if t != "ocr:queued"]
+        if ocr_info.get("ok"):
+            if "ocr:done" not in tags:
+                tags.append("ocr:done")
+        else:
+            if "ocr:failed" not in tags:
+                tags.append("ocr:failed")
+        row.tags = tags
+        row.updated_at = datetime.utcnow()
+        # doc_id is unique (uidx_docs_doc_id): the tracked row is the only one
+        db.commit()
+        _invalidate_admin_docs_cache()
+    _finish_job(jid, "done" if ocr_info.get("ok") else "failed")
+
+
+def _log_hash_backend() -> None:
+    """Report which SHA-256 implementation integrity hashing runs on.
+
+    OpenSSL >= 1.1.1 uses SHA-NI / ARMv8 crypto extensions when the CPU has
+    them; CPython's builtin fallback is several times slower on large files.
+    """
+    backend = "openssl" if hashlib.sha256.__name__.startswith("openssl_") else "builtin"
+    print(f"[hash] sha256 backend={backend} ({ssl.OPENSSL_VERSION})")
+    if backend != "openssl":
+        print("[hash] warning: hashlib is not OpenSSL-backed; integrity checks will be slow")
 
 
 @app.on_event("startup")
 async def _startup_tasks():
+    _log_hash_backend()
     # fire-and-forget background task
     asyncio.create_task(_integrity_worker())
     asyncio.create_task(_ocr_worker())
+    asyncio.create_task(_notif_writer())
+    asyncio.create_task(_notification_worker())
     # ensure DB structures
     try:
         _init_jobs_table()
@@ -371,36 +847,122 @@ async def _startup_tasks():
         _ensure_unique_docid_index()
     except Exception:
         pass
+    try:
+        _ensure_docs_list_indexes()
+    except Exception:
+        pass
+    try:
+        _sqlite_optimize("=0x10002")
+    except Exception:
+        pass
+    asyncio.create_task(_optimize_worker())
+
+
+@app.on_event("shutdown")
+async def _shutdown_tasks():
+    gdrive.close()
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(wait=False, cancel_futures=True)
+
+
+TAIL_BLOCK = 64 * 1024
+
+
+def _iter_lines_reversed(path: Path):
+    """Yield lines of a file last-to-first, reading fixed-size blocks from the end."""
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        rest = b""
+        while pos > 0:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + rest
+            lines = buf.split(b"\n")
+            # first piece may be a partial line; keep it for the next block
+            rest = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line
+        if rest:
+            yield rest
 
 
 @app.get("/api/reports/integrity")
-def get_integrity_report(
+async def get_integrity_report(
     matter_id: Optional[str] = None,
     status: Optional[str] = None,
     doc_id: Optional[str] = None,
     only_failed: bool = False,
     limit: int = 100,
 ):
-    """Aggregate last records per doc_id with optional filters."""
+    # the JSONL fallback can read a multi-MB tail; keep it off the event loop
+    return await asyncio.to_thread(_integrity_report, matter_id, status, doc_id, only_failed, limit)
+
+
+def _integrity_report(
+    matter_id: Optional[str],
+    status: Optional[str],
+    doc_id: Optional[str],
+    only_failed: bool,
+    limit: int,
+) -> dict:
+    """Last record per doc_id with optional filters, served from doc_integrity."""
+    clauses = []
+    params: Dict[str, object] = {"limit": max(0, limit)}
+    if matter_id:
+        clauses.append("matter_id = :matter_id")
+        params["matter_id"] = matter_id
+    if status:
+        clauses.append("status = :status")
+        params["status"] = status
+    if doc_id:
+        clauses.append("doc_id = :doc_id")
+        params["doc_id"] = doc_id
+    if only_failed:
+        clauses.append("(error IS NOT NULL OR NOT match)")
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    with engine.connect() as conn:
+        has_rows = conn.execute(text("SELECT 1 FROM doc_integrity LIMIT 1")).first() is not None
+        if has_rows:
+            rows = conn.execute(
+                text(f"SELECT * FROM doc_integrity{where} ORDER BY ts DESC LIMIT :limit"),
+                params,
+            ).fetchall()
+            result = [_integrity_row_to_record(r) for r in rows]
+            return {"count": len(result), "items": result}
+    # Table not populated yet (log predates it): fall back to the JSONL scan
     items: Dict[str, dict] = {}
-    if INTEGRITY_REPORT_PATH.exists():
-        # read from end for efficiency
-        lines = INTEGRITY_REPORT_PATH.read_text(encoding="utf-8").splitlines()
-        for line in reversed(lines):
+    # limit <= 0 would never hit the early break below and walk the whole file
+    if limit > 0 and INTEGRITY_REPORT_PATH.exists():
+        # Cheap byte-level prefilters: the JSON-encoded value must appear in the line
+        needles = [
+            orjson.dumps(v)
+            for v in (doc_id, matter_id, status) if v
+        ]
+        # Field predicates built once, evaluated only for lines that passed
+        preds = []
+        if doc_id:
+            preds.append(lambda r: r.get("doc_id") == doc_id)
+        if matter_id:
+            preds.append(lambda r: r.get("matter_id") == matter_id)
+        if status:
+            preds.append(lambda r: r.get("status") == status)
+        if only_failed:
+            preds.append(lambda r: ("result" in r and not r["result"].get("match")) or ("error" in r))
+        # read from end for efficiency; stops once `limit` docs are collected
+        for line in _iter_lines_reversed(INTEGRITY_REPORT_PATH):
+            if any(n not in line for n in needles):
+                continue
             try:
-                rec = json.loads(line)
-            except Exception:
+                rec = orjson.loads(line)
+            except orjson.JSONDecodeError:
                 continue
             did = rec.get("doc_id")
             if not did or did in items:
                 continue
-            if matter_id and rec.get("matter_id") != matter_id:
-                continue
-            if status and rec.get("status") != status:
-                continue
-            if only_failed and not (
-                ("result" in rec and not rec["result"].get("match")) or ("error" in rec)
-            ):
+            if not all(p(rec) for p in preds):
                 continue
             items[did] = rec
             if len(items) >= limit:
@@ -416,7 +978,8 @@ def _is_local_request(req: Request) -> bool:
     return host in ("127.0.0.1", "::1", "localhost")
 
 
-def _enforce_client_token(req: Request, row: Doc | None = None) -> None:
+def _enforce_client_token(req: Request, row=None) -> None:
+    # row: a Doc or any row-like object with a `status` attribute
     if not CLIENT_READ_TOKEN:
         return
     if _is_local_request(req):
@@ -427,10 +990,51 @@ def _enforce_client_token(req: Request, row: Doc | None = None) -> None:
     if token != CLIENT_READ_TOKEN:
         raise HTTPException(status_code=401, detail="Missing or invalid client token")
 
-def ensure_matter_structure(db: Session, matter_id: str) -> str:
-    """Ensure /Matters/{YEAR}/{MatterID}/01_Intake exists, return folder id for 01_Intake."""
+# matter_id -> 01_Intake folder id. Backed by matters.intake_folder_id, so other
+# workers fill theirs from the DB; dropped everywhere when an upload into it fails.
+INTAKE_FOLDER_CACHE_MAX = 1024
+_intake_folder_ids: Dict[str, str] = {}
+
+
+def _forget_intake_folder(matter_id: str, folder_id: str) -> None:
+    """Forget a possibly stale intake folder so the next upload re-resolves it on Drive."""
+    _intake_folder_ids.pop(matter_id, None)
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE matters SET intake_folder_id = NULL WHERE matter_id = :m AND intake_folder_id = :f"),
+                {"m": matter_id, "f": folder_id},
+            )
+        gdrive.forget_folder(folder_id)
+    except SQLAlchemyError as e:
+        print(f"[matter] could not reset intake folder for {matter_id}: {e!r}")
+
+
+def ensure_matter_structure(matter_id: str) -> str:
+    """Ensure /Matters/{YEAR}/{MatterID}/01_Intake exists, return folder id for 01_Intake.
+
+    Blocking (Drive round-trips); matter rows are committed here, before the caller uploads.
+    """
     if not GDRIVE_ROOT_FOLDER_ID:
         raise HTTPException(status_code=500, detail="GDRIVE_ROOT_FOLDER_ID not configured")
+    hit = _intake_folder_ids.get(matter_id)
+    if hit:
+        return hit
+    intake_id = _ensure_matter_structure(matter_id)
+    if len(_intake_folder_ids) >= INTAKE_FOLDER_CACHE_MAX:
+        _intake_folder_ids.clear()
+    _intake_folder_ids[matter_id] = intake_id
+    return intake_id
+
+
+def _ensure_matter_structure(matter_id: str) -> str:
+    # Warm path: structure was created before, intake id is stored on the matter
+    with engine.connect() as conn:
+        cached = conn.execute(
+            text("SELECT intake_folder_id FROM matters WHERE matter_id = :m"), {"m": matter_id}
+        ).scalar()
+    if cached:
+        return cached
     root_id = GDRIVE_ROOT_FOLDER_ID
     root_name = GDRIVE_ROOT_PATH.strip("/").split("/")[0]
 
@@ -439,12 +1043,6 @@ def ensure_matter_structure(db: Session, matter_id: str) -> str:
     year_id = gdrive.find_or_create_folder(year, matters_id)
     matter_folder_id = gdrive.find_or_create_folder(matter_id, year_id)
 
-    # Save matter record if not exists
-    exists = db.execute(select(Matter).where(Matter.matter_id == matter_id)).scalar_one_or_none()
-    if not exists:
-        db.add(Matter(matter_id=matter_id, folder_path=f"/{root_name}/{year}/{matter_id}/"))
-        db.commit()
-
     # Subfolders
     subs = [
         "01_Intake",
@@ -455,24 +1053,79 @@ def ensure_matter_structure(db: Session, matter_id: str) -> str:
         "99_Archive",
         "Client_Share",
     ]
-    sub_ids = {name: gdrive.find_or_create_folder(name, matter_folder_id) for name in subs}
+    # Independent siblings: create/look them up concurrently (≈1 RTT instead of 7).
+    # No session is open yet: find_or_create_folder writes drive_folders on its own
+    # connections and must not wait behind our matters write.
+    with ThreadPoolExecutor(max_workers=len(subs)) as ex:
+        sub_ids = dict(zip(subs, ex.map(lambda n: gdrive.find_or_create_folder(n, matter_folder_id), subs)))
+
+    # Save matter record if not exists; one short write transaction
+    with SessionLocal() as db:
+        exists = db.execute(select(Matter).where(Matter.matter_id == matter_id)).scalar_one_or_none()
+        if not exists:
+            db.add(Matter(matter_id=matter_id, folder_path=f"/{root_name}/{year}/{matter_id}/"))
+            db.flush()
+        db.execute(
+            text("UPDATE matters SET intake_folder_id = :f WHERE matter_id = :m"),
+            {"f": sub_ids["01_Intake"], "m": matter_id},
+        )
+        db.commit()
     return sub_ids["01_Intake"]
 
 
 # --- Notifications (file log + optional Email/Matrix) ---
+# Log lines go through a thread-safe queue (notify runs in the threadpool)
+# and are appended by a single writer task, one open() per flush window.
+_notif_q: "queue.SimpleQueue[dict]" = queue.SimpleQueue()
+_notif_writer_running = False
+NOTIF_FLUSH_SEC = 0.05
+NOTIF_FLUSH_MAX = 100
+
+
+def _append_notif_lines(entries: List[dict]) -> None:
+    log_path = Path(NOTIF_LOG_PATH)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("ab") as f:
+        f.writelines(orjson.dumps(e) + b"\n" for e in entries)
+
+
+def _log_notification(entry: dict) -> None:
+    if _notif_writer_running:
+        _notif_q.put_nowait(entry)
+    else:
+        # no event loop writer (e.g. imported from a script): write directly
+        _append_notif_lines([entry])
+
+
+async def _notif_writer():
+    global _notif_writer_running
+    _notif_writer_running = True
+    while True:
+        batch: List[dict] = []
+        try:
+            while len(batch) < NOTIF_FLUSH_MAX:
+                batch.append(_notif_q.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            try:
+                await asyncio.to_thread(_append_notif_lines, batch)
+            except Exception:
+                pass
+        if len(batch) < NOTIF_FLUSH_MAX:
+            await asyncio.sleep(NOTIF_FLUSH_SEC)
+
+
 def notify(event: str, payload: dict) -> None:
     if not NOTIF_ENABLE:
         return
     try:
-        log_path = Path(NOTIF_LOG_PATH)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
         entry = {
             "ts": datetime.utcnow().isoformat() + "Z",
             "event": event,
             "payload": payload,
         }
-        with log_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        _log_notification(entry)
 
         # Email hook: doc_registered/result_delivered
         if (
@@ -499,11 +1152,9 @@ def notify(event: str, payload: dict) -> None:
                 body=body,
             )
             if err:
-                with log_path.open("a", encoding="utf-8") as f:
-                    f.write(json.dumps({"ts": entry["ts"], "event": "email_error", "error": err}, ensure_ascii=False) + "\n")
+                _log_notification({"ts": entry["ts"], "event": "email_error", "error": err})
             else:
-                with log_path.open("a", encoding="utf-8") as f:
-                    f.write(json.dumps({"ts": entry["ts"], "event": "email_sent", "payload": {"event": event, "doc_id": payload.get("doc_id")}}, ensure_ascii=False) + "\n")
+                _log_notification({"ts": entry["ts"], "event": "email_sent", "payload": {"event": event, "doc_id": payload.get("doc_id")}})
 
         # Matrix hook: doc_registered/result_delivered
         if (
@@ -525,16 +1176,38 @@ def notify(event: str, payload: dict) -> None:
                 text=text,
             )
             if merr:
-                with log_path.open("a", encoding="utf-8") as f:
-                    f.write(json.dumps({"ts": entry["ts"], "event": "matrix_error", "error": merr}, ensure_ascii=False) + "\n")
+                _log_notification({"ts": entry["ts"], "event": "matrix_error", "error": merr})
             else:
-                with log_path.open("a", encoding="utf-8") as f:
-                    f.write(json.dumps({"ts": entry["ts"], "event": "matrix_sent", "payload": {"event": event, "doc_id": payload.get("doc_id")}}, ensure_ascii=False) + "\n")
+                _log_notification({"ts": entry["ts"], "event": "matrix_sent", "payload": {"event": event, "doc_id": payload.get("doc_id")}})
     except Exception:
         # не роняем запрос из-за уведомлений
         pass
 
 
+# Events go through an asyncio queue to a single worker, which runs notify()
+# (file append, SMTP, Matrix HTTPS) in a thread; handlers only enqueue.
+_notif_events: "asyncio.Queue[tuple[str, dict]] | None" = None
+_notif_loop: asyncio.AbstractEventLoop | None = None
+
+
+def enqueue_notification(event: str, payload: dict) -> None:
+    """Thread-safe: callable from async handlers and from threadpool endpoints."""
+    if _notif_events is None or _notif_loop is None:
+        # no worker (e.g. imported from a script): deliver inline
+        notify(event, payload)
+        return
+    _notif_loop.call_soon_threadsafe(_notif_events.put_nowait, (event, payload))
+
+
+async def _notification_worker():
+    global _notif_events, _notif_loop
+    _notif_events = asyncio.Queue()
+    _notif_loop = asyncio.get_running_loop()
+    while True:
+        event, payload = await _notif_events.get()
+        await asyncio.to_thread(notify, event, payload)
+
+
 @app.post("/api/docs/register")
 async def register_document(
     matter_id: str = Form(...),
@@ -547,100 +1220,99 @@ async def register_document(
     status: str | None = Form(default=None),
     tags: str | None = Form(default=None),  # JSON array string
 ):
-    # Save upload to temp file to hash
-    with tempfile.NamedTemporaryFile(delete=False) as tf:
-        temp_path = tf.name
-        total = 0
-        max_bytes = UPLOAD_MAX_BYTES_AUDIO if _is_audio(file.filename, file.content_type) else UPLOAD_MAX_BYTES_DEFAULT
-        while True:
-            chunk = await file.read(1024 * 1024)
-            if not chunk:
-                break
-            tf.write(chunk)
-            total += len(chunk)
-            if total > max_bytes:
-                try:
-                    os.remove(temp_path)
-                except Exception:
-                    pass
-                return JSONResponse(status_code=413, content={"error": "File too large"})
+    # Starlette has already spooled the multipart body, so its size is known
+    # up front; upload straight from that spool instead of copying it again.
+    max_bytes = UPLOAD_MAX_BYTES_AUDIO if _is_audio(file.filename, file.content_type) else UPLOAD_MAX_BYTES_DEFAULT
+    size = file.size
+    if size is None:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+    file.file.seek(0)
+    if size > max_bytes:
+        return ORJSONResponse(status_code=413, content={"error": "File too large"})
     try:
-        try:
-            # MIME and extension validation (best-effort)
-            ctype = (file.content_type or "").lower()
-            _, req_ext = os.path.splitext(file.filename or "")
-            req_ext = req_ext.lower()
-            if ctype and ctype not in ALLOWED_CONTENT_TYPES:
-                return JSONResponse(status_code=415, content={"error": f"Unsupported content type: {ctype}"})
-            if req_ext and req_ext not in ALLOWED_EXTS:
-                return JSONResponse(status_code=415, content={"error": f"Unsupported file extension: {req_ext}"})
-            sha256 = compute_sha256(temp_path)
-            doc_id = generate_doc_id()
-
-            # Ensure folder and upload to Drive
-            with SessionLocal() as db:
-                intake_folder_id = ensure_matter_structure(db, matter_id)
-
-            safe_name = f"{doc_id}__{title}"
-            _, ext = os.path.splitext(file.filename or "")
-            target_name = f"{safe_name}{ext}" if ext else safe_name
-            uploaded = gdrive.upload_file(intake_folder_id, temp_path, target_name)
-            storage_ref = uploaded.get("id")
-            web_link = uploaded.get("webViewLink")
-
-            permalink = build_permalink(doc_id)
-
-            # Save DB record
-            with SessionLocal() as db:
-                db_doc = Doc(
-                    doc_id=doc_id,
-                    matter_id=matter_id,
-                    class_name=class_,
-                    title=title,
-                    sha256_plain=sha256,
-                    storage="gdrive",
-                    storage_ref=storage_ref,
-                    origin=(origin or "upload"),
-                    origin_meta=(json.loads(origin_meta) if origin_meta else None),
-                    owner=owner,
-                    status=(status or "registered"),
-                    tags=(json.loads(tags) if tags else None),
-                )
-                db.add(db_doc)
-                db.commit()
+        # MIME and extension validation (best-effort)
+        ctype = (file.content_type or "").lower()
+        _, req_ext = os.path.splitext(file.filename or "")
+        req_ext = req_ext.lower()
+        if ctype and ctype not in ALLOWED_CONTENT_TYPES:
+            return ORJSONResponse(status_code=415, content={"error": f"Unsupported content type: {ctype}"})
+        if req_ext and req_ext not in ALLOWED_EXTS:
+            return ORJSONResponse(status_code=415, content={"error": f"Unsupported file extension: {req_ext}"})
+        # trust the bytes, not the client's labels; rejected before anything reaches Drive
+        head = file.file.read(SNIFF_BYTES)
+        file.file.seek(0)
+        if not _content_matches(head, req_ext, ctype):
+            return ORJSONResponse(status_code=415, content={"error": "File content does not match its type"})
+        doc_id = generate_doc_id()
 
-            # уведомление о регистрации
-            notify(
-                "doc_registered",
-                {
-                    "matter_id": matter_id,
-                    "class": class_,
-                    "title": title,
-                    "doc_id": doc_id,
-                    "permalink": permalink,
-                },
-            )
+        # Ensure folder (blocking Drive calls; matter rows committed before the upload)
+        intake_folder_id = await asyncio.to_thread(ensure_matter_structure, matter_id)
 
-            return JSONResponse(
-                status_code=201,
-                content={
-                    "doc_id": doc_id,
-                    "permalink": permalink,
-                    "sha256": sha256,
-                    "storage": "gdrive",
-                    "storage_ref": storage_ref,
-                    "webViewLink": web_link,
-                },
-            )
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            return JSONResponse(status_code=500, content={"error": str(e)})
-    finally:
+        safe_name = f"{doc_id}__{title}"
+        _, ext = os.path.splitext(file.filename or "")
+        target_name = f"{safe_name}{ext}" if ext else safe_name
+        # one read of the body: sent to Drive and hashed in the same pass
         try:
-            os.remove(temp_path)
+            uploaded = await asyncio.to_thread(gdrive.upload_fileobj, intake_folder_id, file.file, target_name)
         except Exception:
-            pass
+            await asyncio.to_thread(_forget_intake_folder, matter_id, intake_folder_id)
+            raise
+        sha256 = uploaded["sha256"]
+        storage_ref = uploaded.get("id")
+        web_link = uploaded.get("webViewLink")
+
+        permalink = build_permalink(doc_id)
+
+        # Save DB record; Drive work is done, so the write lock is held only briefly
+        with SessionLocal() as db:
+            db_doc = Doc(
+                doc_id=doc_id,
+                matter_id=matter_id,
+                class_name=class_,
+                title=title,
+                sha256_plain=sha256,
+                storage="gdrive",
+                storage_ref=storage_ref,
+                origin=(origin or "upload"),
+                origin_meta=(json.loads(origin_meta) if origin_meta else None),
+                owner=owner,
+                status=(status or "registered"),
+                tags=(json.loads(tags) if tags else None),
+            )
+            db.add(db_doc)
+            db.flush()
+            _set_doc_md5(db, doc_id, uploaded.get("md5"))
+            db.commit()
+            _invalidate_admin_docs_cache()
+
+        # уведомление о регистрации (в фоне, вне запроса)
+        enqueue_notification(
+            "doc_registered",
+            {
+                "matter_id": matter_id,
+                "class": class_,
+                "title": title,
+                "doc_id": doc_id,
+                "permalink": permalink,
+            },
+        )
+
+        return ORJSONResponse(
+            status_code=201,
+            content={
+                "doc_id": doc_id,
+                "permalink": permalink,
+                "sha256": sha256,
+                "storage": "gdrive",
+                "storage_ref": storage_ref,
+                "webViewLink": web_link,
+            },
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return ORJSONResponse(status_code=500, content={"error": str(e)})
 
 
 @app.post("/api/hooks/docassemble")
@@ -657,9 +1329,14 @@ def hook_docassemble(payload: DocassembleHook, request: Request):
     if not (payload.file_base64 or payload.file_url):
         raise HTTPException(status_code=400, detail="file_base64 or file_url required")
 
+    # titles are free text ("Claim of 01.02"), so only a known suffix counts as an extension
+    title_ext = os.path.splitext(payload.title)[1].lower()
+    if title_ext not in ALLOWED_EXTS:
+        title_ext = ""
+
     temp_path = None
     try:
-        # Prepare temp file
+        # Prepare temp file; it is hashed by the upload that reads it back
         with tempfile.NamedTemporaryFile(delete=False) as tf:
             temp_path = tf.name
             if payload.file_base64:
@@ -672,26 +1349,53 @@ def hook_docassemble(payload: DocassembleHook, request: Request):
                 limit = UPLOAD_MAX_BYTES_AUDIO if is_audio else UPLOAD_MAX_BYTES_DEFAULT
                 if len(data) > limit:
                     raise HTTPException(status_code=413, detail="File too large")
+                if not _content_matches(data[:SNIFF_BYTES], title_ext, None):
+                    raise HTTPException(status_code=415, detail="File content does not match its type")
                 tf.write(data)
             else:
                 try:
-                    r = requests.get(payload.file_url, timeout=20)
+                    r = requests.get(payload.file_url, timeout=20, stream=True)
                     r.raise_for_status()
-                    data = r.content
                 except Exception as e:
                     raise HTTPException(status_code=400, detail=f"Failed to download: {e}")
-                is_audio = _is_audio(payload.title, r.headers.get("Content-Type"))
-                limit = UPLOAD_MAX_BYTES_AUDIO if is_audio else UPLOAD_MAX_BYTES_DEFAULT
-                if len(data) > limit:
-                    raise HTTPException(status_code=413, detail="File too large")
-                tf.write(data)
-
-        # Compute hash and upload like register_document
-        sha256 = compute_sha256(temp_path)
+                with r:
+                    is_audio = _is_audio(payload.title, r.headers.get("Content-Type"))
+                    limit = UPLOAD_MAX_BYTES_AUDIO if is_audio else UPLOAD_MAX_BYTES_DEFAULT
+                    # reject before reading a byte when the server announces the size
+                    declared = r.headers.get("Content-Length")
+                    if declared and declared.isdigit() and int(declared) > limit:
+                        raise HTTPException(status_code=413, detail="File too large")
+                    total = 0
+                    # chunks can be shorter than SNIFF_BYTES: hold them until the head is complete
+                    head = bytearray()
+                    try:
+                        for chunk in r.iter_content(UPLOAD_READ_CHUNK):
+                            total += len(chunk)
+                            if total > limit:
+                                raise HTTPException(status_code=413, detail="File too large")
+                            if head is not None:
+                                head += chunk
+                                if len(head) < SNIFF_BYTES:
+                                    continue
+                                # checked on the head, before the rest is fetched
+                                if not _content_matches(bytes(head[:SNIFF_BYTES]), title_ext, r.headers.get("Content-Type")):
+                                    raise HTTPException(status_code=415, detail="File content does not match its type")
+                                chunk, head = head, None
+                            tf.write(chunk)
+                        if head is not None:
+                            # whole body shorter than SNIFF_BYTES
+                            if not _content_matches(bytes(head), title_ext, r.headers.get("Content-Type")):
+                                raise HTTPException(status_code=415, detail="File content does not match its type")
+                            tf.write(head)
+                    except HTTPException:
+                        raise
+                    except Exception as e:
+                        raise HTTPException(status_code=400, detail=f"Failed to download: {e}")
+
+        # Upload like register_document
         doc_id = generate_doc_id()
 
-        with SessionLocal() as db:
-            intake_folder_id = ensure_matter_structure(db, payload.matter_id)
+        intake_folder_id = ensure_matter_structure(payload.matter_id)
 
         # Guess extension from title or content
         title = payload.title
@@ -704,13 +1408,18 @@ def hook_docassemble(payload: DocassembleHook, request: Request):
         safe_name = f"{doc_id}__{title}"
         target_name = f"{safe_name}{ext}" if ext else safe_name
 
-        uploaded = gdrive.upload_file(intake_folder_id, temp_path, target_name)
+        try:
+            uploaded = gdrive.upload_file(intake_folder_id, temp_path, target_name)
+        except Exception:
+            _forget_intake_folder(payload.matter_id, intake_folder_id)
+            raise
+        sha256 = uploaded["sha256"]
         storage_ref = uploaded.get("id")
         web_link = uploaded.get("webViewLink")
 
         permalink = build_permalink(doc_id)
 
-        # Save DB record
+        # Save DB record; Drive work is done, so the write lock is held only briefly
         with SessionLocal() as db:
             db_doc = Doc(
                 doc_id=doc_id,
@@ -727,10 +1436,13 @@ def hook_docassemble(payload: DocassembleHook, request: Request):
                 tags=None,
             )
             db.add(db_doc)
+            db.flush()
+            _set_doc_md5(db, doc_id, uploaded.get("md5"))
             db.commit()
+            _invalidate_admin_docs_cache()
 
-        # notify
-        notify(
+        # notify (queued; sent by the notification worker)
+        enqueue_notification(
             "doc_registered",
             {
                 "matter_id": payload.matter_id,
@@ -741,7 +1453,7 @@ def hook_docassemble(payload: DocassembleHook, request: Request):
             },
         )
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=201,
             content={
                 "doc_id": doc_id,
@@ -758,37 +1470,52 @@ def hook_docassemble(payload: DocassembleHook, request: Request):
                 os.remove(temp_path)
             except Exception:
                 pass
+# doc_id -> (expires_at, row) for the permalink redirects; only the three columns
+# the redirect needs are read, and misses are never cached.
+RESOLVE_CACHE_TTL = 60.0
+RESOLVE_CACHE_MAX = 4096
+_resolve_cache: Dict[str, tuple] = {}
+
+
+def _resolve_row(doc_id: str):
+    hit = _resolve_cache.get(doc_id)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    with SessionLocal() as db:
+        row = db.execute(
+            select(Doc.storage, Doc.storage_ref, Doc.status).where(Doc.doc_id == doc_id)
+        ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Doc not found")
+    if len(_resolve_cache) >= RESOLVE_CACHE_MAX:
+        _resolve_cache.clear()
+    _resolve_cache[doc_id] = (time.monotonic() + RESOLVE_CACHE_TTL, row)
+    return row
+
+
+def _resolve_url(doc_id: str, request: Request) -> str:
+    row = _resolve_row(doc_id)
+    if row.storage != "gdrive" or not row.storage_ref:
+        raise HTTPException(status_code=500, detail="Unsupported storage or missing ref")
+    _enforce_client_token(request, row)
+    return f"https://drive.google.com/file/d/{row.storage_ref}/view?usp=drivesdk"
+
+
 @app.get("/doc/{doc_id}")
 def resolve_doc(doc_id: str, request: Request):
-    with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
-        if not row:
-            raise HTTPException(status_code=404, detail="Doc not found")
-        if row.storage != "gdrive" or not row.storage_ref:
-            raise HTTPException(status_code=500, detail="Unsupported storage or missing ref")
-        _enforce_client_token(request, row)
-        url = f"https://drive.google.com/file/d/{row.storage_ref}/view?usp=drivesdk"
-        return RedirectResponse(url)
+    return RedirectResponse(_resolve_url(doc_id, request))
 
 
 @app.head("/doc/{doc_id}")
 def resolve_doc_head(doc_id: str, request: Request):
-    with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
-        if not row:
-            raise HTTPException(status_code=404, detail="Doc not found")
-        if row.storage != "gdrive" or not row.storage_ref:
-            raise HTTPException(status_code=500, detail="Unsupported storage or missing ref")
-        _enforce_client_token(request, row)
-        url = f"https://drive.google.com/file/d/{row.storage_ref}/view?usp=drivesdk"
-        # HEAD: отдаем только заголовки с Location, без тела
-        return RedirectResponse(url)
+    # HEAD: отдаем только заголовки с Location, без тела
+    return RedirectResponse(_resolve_url(doc_id, request))
 
 
 @app.get("/api/docs/{doc_id}")
 def get_doc(doc_id: str, request: Request):
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
         _enforce_client_token(request, row)
@@ -811,8 +1538,15 @@ def get_doc(doc_id: str, request: Request):
 # --- C2.1: enqueue OCR job for a document ---
 @app.post("/api/ocr/enqueue")
 def ocr_enqueue(doc_id: str = Form(...), mode: str = Form("auto")):
+    mode = (mode or "auto").lower()
+    if mode not in ("auto", "image", "pdf"):
+        mode = "auto"
+    jid = _recent_ocr_job(doc_id, mode)
+    if jid is not None:
+        # double submit: the job from a moment ago is still queued or running
+        return {"ok": True, "job_id": jid, "deduplicated": True}
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
         # add tag marker and enqueue job
@@ -823,28 +1557,252 @@ def ocr_enqueue(doc_id: str = Form(...), mode: str = Form("auto")):
             tags.append("ocr:queued")
         row.tags = tags
         row.updated_at = datetime.utcnow()
-        db.add(row)
         db.commit()
-    mode = (mode or "auto").lower()
-    if mode not in ("auto", "image", "pdf"):
-        mode = "auto"
-    jid = _enqueue_job("ocr", {"doc_id": doc_id, "mode": mode})
-    return {"ok": True, "job_id": jid}
+        _invalidate_admin_docs_cache()
+    jid, dup = _enqueue_ocr_once(doc_id, mode)
+    return {"ok": True, "job_id": jid, "deduplicated": dup}
 
 
 # --- C2.2: OCR helpers ---
-def _run_cmd(cmd: list[str], input_bytes: bytes | None = None, timeout_sec: int = 120) -> tuple[int, bytes, bytes]:
+def _run_cmd(cmd: list[str], input_bytes: bytes | None = None, timeout_sec: int = 120, env: dict | None = None) -> tuple[int, bytes, bytes]:
     try:
-        p = subprocess.Popen(cmd, stdin=subprocess.PIPE if input_bytes is not None else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        p = subprocess.Popen(cmd, stdin=subprocess.PIPE if input_bytes is not None else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
         out, err = p.communicate(input=input_bytes, timeout=timeout_sec)
         return p.returncode, out or b"", err or b""
     except Exception as e:
         return 1, b"", str(e).encode()
 
 
-def _run_ocr_pipeline(content: bytes, name: str, mode: str = "auto") -> tuple[str, dict]:
+# OCR tools resolved once at import (absolute paths, or None when not installed)
+_PDFTOTEXT = shutil.which("pdftotext")
+_PDFTOPPM = shutil.which("pdftoppm")
+_PDFTOCAIRO = shutil.which("pdftocairo")
+_TESSERACT = shutil.which("tesseract")
+_CONVERT = shutil.which("convert")
+
+# Rendered page format. Quality-85 JPEG is several times smaller than PNG at the
+# same DPI (less disk and decode work per page); OCR_FORMAT=png keeps it lossless.
+if OCR_FORMAT == "png":
+    _PAGE_FMT_ARGS, _PAGE_GLOB = ["-png"], "page-*.png"
+else:
+    _PAGE_FMT_ARGS, _PAGE_GLOB = ["-jpeg", "-jpegopt", "quality=85"], "page-*.jpg"
+
+# Pages are independent: run up to OCR_CONCURRENCY tesseract processes at once.
+# Each is capped to one OpenMP thread so parallel pages don't oversubscribe cores
+# (an OMP_THREAD_LIMIT set in the service environment wins).
+_TESS_ENV = {"OMP_THREAD_LIMIT": "1", **os.environ}
+
+
+def _run_piped(cmd1: list[str], cmd2: list[str], timeout_sec: int = 180, env: dict | None = None) -> tuple[int, int, bytes, bytes]:
+    """Run `cmd1 | cmd2`; return (code1, code2, stdout2, stderr2)."""
+    try:
+        p1 = subprocess.Popen(cmd1, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            p2 = subprocess.Popen(cmd2, stdin=p1.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        finally:
+            # p2 owns the read end now; lets p1 get SIGPIPE if p2 exits early
+            p1.stdout.close()
+        try:
+            out, err = p2.communicate(timeout=timeout_sec)
+            code1 = p1.wait(timeout=timeout_sec)
+        except subprocess.TimeoutExpired:
+            p1.kill()
+            p2.kill()
+            p1.wait()
+            p2.wait()
+            return 1, 1, b"", b"timeout"
+        return code1, p2.returncode, out or b"", err or b""
+    except Exception as e:
+        return 1, 1, b"", str(e).encode()
+
+
+def _ocr_page(p: Path) -> str:
+    """OCR one rendered page (optionally preprocessed); empty string on failure."""
+    tess = [_TESSERACT, "stdin", "-", "-l", OCR_LANGS, "--oem", "1", "--psm", "6"]
+    c = 1
+    # Optional pre-processing with ImageMagick, streamed into tesseract without an intermediate file
+    if _CONVERT:
+        # Conservative pipeline: grayscale + normalize + slight sharpen
+        # Avoid aggressive thresholding to not lose fine glyphs
+        cmd_conv = [
+            _CONVERT, str(p),
+            "-colorspace", "Gray",
+            "-normalize",
+            "-contrast-stretch", "0.5%x0.5%",
+            "-sharpen", "0x1",
+            "png:-",
+        ]
+        cprep, c, o, e = _run_piped(cmd_conv, tess, timeout_sec=180, env=_TESS_ENV)
+        if DEBUG_OCR:
+            try:
+                print(f"[ocr] preprocess convert page={p.name} code={cprep}")
+            except Exception:
+                pass
+        if cprep != 0:
+            c = 1
+    if c != 0:
+        tess[1] = str(p)
+        c, o, e = _run_cmd(tess, timeout_sec=180, env=_TESS_ENV)
+    if DEBUG_OCR and c != 0:
+        try:
+            print(f"[ocr] tesseract page={p.name} code={c} err={(e or b'').decode(errors='replace')[:200]}")
+        except Exception:
+            pass
+    if c == 0 and o:
+        return o.decode("utf-8", errors="replace")
+    # keep going; collect errors optionally
+    return ""
+
+
+# Optional in-process tesseract (tesserocr): API instances live as long as their pool
+# process, so the model loads once per process rather than once per job. An instance is
+# not thread-safe, so each page thread checks one out of the idle list (creating one when
+# the list is empty); a job's pages still run OCR_CONCURRENCY-wide. Imported lazily, in
+# the pool process that uses it; None when not installed or its models fail to load.
+_tess_idle: dict[bool, list] = {True: [], False: []}
+_tess_lock = threading.Lock()
+_tesserocr = False  # not probed yet
+
+
+def _tess_module():
+    global _tesserocr
+    with _tess_lock:
+        if _tesserocr is False:
+            # read by libgomp when the binding loads; same cap as the CLI path
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            try:
+                import tesserocr
+            except Exception:
+                tesserocr = None
+            _tesserocr = tesserocr
+        return _tesserocr
+
+
+def _tess_checkout(psm_single_block: bool):
+    """An idle tesserocr API for the mode, or a new one; None to use the CLI instead."""
+    global _tesserocr
+    mod = _tess_module()
+    if mod is None:
+        return None
+    with _tess_lock:
+        idle = _tess_idle[psm_single_block]
+        if idle:
+            return idle.pop()
+    psm = mod.PSM.SINGLE_BLOCK if psm_single_block else mod.PSM.AUTO
+    try:
+        return mod.PyTessBaseAPI(lang=OCR_LANGS, psm=psm, oem=mod.OEM.LSTM_ONLY)
+    except Exception as e:
+        # missing or broken traineddata for OCR_LANGS: stop trying, the CLI reports why
+        print(f"[ocr] tesserocr unavailable, using the tesseract CLI: {e!r}")
+        _tesserocr = None
+        return None
+
+
+def _tess_ocr(path: Path, psm_single_block: bool = True) -> str | None:
+    """Text of one image via tesserocr; None if unavailable or it failed."""
+    api = _tess_checkout(psm_single_block)
+    if api is None:
+        return None
+    try:
+        api.SetImageFile(str(path))
+        return api.GetUTF8Text()
+    except RuntimeError:
+        return None
+    finally:
+        with _tess_lock:
+            _tess_idle[psm_single_block].append(api)
+
+
+def _ocr_worker_init() -> None:
+    # load the models when the pool process starts, not inside the first job;
+    # never raises, so a bad install cannot break the pool
+    for psm_single_block in (True, False):
+        api = _tess_checkout(psm_single_block)
+        if api is not None:
+            _tess_idle[psm_single_block].append(api)
+
+
+def _ocr_page_batch(batch: list[Path]) -> list[str]:
+    """OCR several unprocessed pages with one tesseract run (one model load).
+
+    tesseract reads an image list file and ends every page with a form feed.
+    """
+    if _tess_module() is not None:
+        texts = []
+        for p in batch:
+            out = _tess_ocr(p)
+            texts.append(out if out is not None else _ocr_page(p))
+        return texts
+    list_path = batch[0].with_name(batch[0].stem + "-list.txt")
+    list_path.write_text("".join(f"{p}\n" for p in batch))
+    c, o, e = _run_cmd(
+        [_TESSERACT, str(list_path), "-", "-l", OCR_LANGS, "--oem", "1", "--psm", "6"],
+        timeout_sec=180 * len(batch),
+        env=_TESS_ENV,
+    )
+    texts = o.decode("utf-8", errors="replace").split("\f") if c == 0 else []
+    if len(texts) < len(batch):
+        if DEBUG_OCR:
+            try:
+                print(f"[ocr] tesseract batch of {len(batch)} code={c} err={(e or b'').decode(errors='replace')[:200]}; per page")
+            except Exception:
+                pass
+        return [_ocr_page(p) for p in batch]
+    return texts[:len(batch)]
+
+
+_LETTER_RE = re.compile(r"[A-Za-zА-Яа-я]")
+
+
+RENDER_POLL_SEC = 0.05
+
+
+def _run_render_streamed(cmd: list[str], out_dir: Path, on_page, timeout_sec: int = 600) -> tuple[int, bytes]:
+    """Run a page renderer, handing each finished page image to on_page while it runs.
+
+    pdftoppm writes pages one at a time, so every page file but the newest is complete;
+    the rest are handed over once it exits successfully.
+    """
+    seen: set[Path] = set()
+
+    def _drain(final: bool) -> None:
+        files = sorted(out_dir.glob(_PAGE_GLOB))
+        for f in (files if final else files[:-1]):
+            if f not in seen:
+                seen.add(f)
+                on_page(f)
+
+    try:
+        # stderr to a file: a pipe nobody reads while polling could fill and stall the renderer
+        with tempfile.TemporaryFile() as errf:
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=errf)
+            deadline = time.monotonic() + timeout_sec
+            while proc.poll() is None:
+                if time.monotonic() > deadline:
+                    proc.kill()
+                    proc.wait()
+                    return 1, b"timeout"
+                _drain(False)
+                time.sleep(RENDER_POLL_SEC)
+            errf.seek(0)
+            err = errf.read()
+        if proc.returncode == 0:
+            _drain(True)
+        return proc.returncode, err
+    except Exception as e:
+        return 1, str(e).encode()
+
+
+def _run_ocr_pipeline(path: str, name: str, mode: str = "auto") -> tuple[str, dict]:
+    """OCR a file on disk (the process-pool entry point).
+
+    The tools read the file in place, so the body is never loaded or copied here.
+    """
     name_lower = (name or "").lower()
-    is_pdf = name_lower.endswith(".pdf") or (content[:4] == b"%PDF")
+    is_pdf = name_lower.endswith(".pdf")
+    if not is_pdf:
+        with open(path, "rb") as f:
+            is_pdf = f.read(4) == b"%PDF"
     if DEBUG_OCR:
         try:
             print(f"[ocr] detect: name={name_lower} is_pdf={is_pdf} mode={mode}")
@@ -852,10 +1810,9 @@ def _run_ocr_pipeline(content: bytes, name: str, mode: str = "auto") -> tuple[st
             pass
     # Try pdftotext for PDFs; if looks empty, fallback to tesseract per page
     if is_pdf:
+        pdf_path = Path(path)
+        # page images only; the PDF itself is read where it is
         with tempfile.TemporaryDirectory() as td:
-            pdf_path = Path(td) / "input.pdf"
-            with open(pdf_path, "wb") as f:
-                f.write(content)
             # If forced image mode, skip pdftotext and go straight to tesseract
             if mode == "image":
                 if DEBUG_OCR:
@@ -863,115 +1820,100 @@ def _run_ocr_pipeline(content: bytes, name: str, mode: str = "auto") -> tuple[st
                         print("[ocr] pipeline: mode=image -> skip pdftotext, using pdftoppm+tesseract")
                     except Exception:
                         pass
-            elif shutil.which("pdftotext"):
-                code, out, err = _run_cmd(["pdftotext", "-layout", str(pdf_path), "-"])
+            elif _PDFTOTEXT:
+                code, out, err = _run_cmd([_PDFTOTEXT, "-layout", str(pdf_path), "-"])
                 text_pt = out.decode("utf-8", errors="replace") if out else ""
-                # Heuristic: treat as empty if only whitespace/control OR no letters
-                import re
-                compact = re.sub(r"[\s\f\n\r]+", "", text_pt)
-                has_letters = re.search(r"[A-Za-zА-Яа-я]", text_pt) is not None
-                # additionally require letters within first 1000 chars
-                head = text_pt[:1000]
-                head_has_letters = re.search(r"[A-Za-zА-Яа-я]", head) is not None
-                if code == 0 and len(compact) > 0 and has_letters and head_has_letters:
+                # Heuristic: a text layer must have letters within the first 1000 chars
+                # (that alone implies "not only whitespace" and "has letters")
+                if code == 0 and _LETTER_RE.search(text_pt, 0, 1000):
                     info = {"ok": True, "tool": "pdftotext", "code": code, "error": "", "mode": mode}
                     return text_pt, info
             # Fallback to images + tesseract if available
-            if shutil.which("pdftoppm") and shutil.which("tesseract"):
+            if _PDFTOPPM and _TESSERACT:
                 # Convert first N pages to PNG and OCR per page
                 N = int(OCR_MAX_PAGES) if OCR_MAX_PAGES else 20
-                # pdftoppm -r 300 -png input.pdf out
-                code_ppm, _, err_ppm = _run_cmd([
-                    "pdftoppm", "-r", str(int(OCR_DPI)), "-png",
-                    "-f", "1", "-l", str(N),
-                    str(pdf_path), str(Path(td)/"page")
-                ], timeout_sec=600)
-                if DEBUG_OCR:
-                    try:
-                        print(f"[ocr] pdftoppm: code={code_ppm} err={(err_ppm or b'').decode(errors='replace')[:200]}")
-                    except Exception:
-                        pass
-                # Fallback to pdftocairo if pdftoppm failed
-                if code_ppm != 0 and shutil.which("pdftocairo"):
-                    code_ppm, _, err_ppm = _run_cmd([
-                        "pdftocairo", "-png", "-r", str(int(OCR_DPI)),
-                        str(pdf_path), str(Path(td)/"page"), "-f", "1", "-l", str(N)
-                    ], timeout_sec=600)
-                    if DEBUG_OCR:
-                        try:
-                            print(f"[ocr] pdftocairo: code={code_ppm} err={(err_ppm or b'').decode(errors='replace')[:200]}")
-                        except Exception:
-                            pass
-
-                if code_ppm == 0:
-                    pages = sorted(Path(td).glob("page-*.png"))[:N]
+                # Pages are OCRed while the renderer is still producing later ones
+                # (per-page path); the batch path needs the whole set up front.
+                stream_pages = bool(_CONVERT)
+                page_futs: Dict[Path, Future] = {}
+                ex = ThreadPoolExecutor(max_workers=max(1, min(N, OCR_CONCURRENCY)))
+                try:
+                    # pdftoppm -r 300 -jpeg -jpegopt quality=85 input.pdf out
+                    cmd_ppm = [
+                        _PDFTOPPM, "-r", str(int(OCR_DPI)), *_PAGE_FMT_ARGS,
+                        "-f", "1", "-l", str(N),
+                        str(pdf_path), str(Path(td)/"page")
+                    ]
+                    if stream_pages:
+                        code_ppm, err_ppm = _run_render_streamed(
+                            cmd_ppm, Path(td), lambda p: page_futs.setdefault(p, ex.submit(_ocr_page, p)), timeout_sec=600
+                        )
+                    else:
+                        code_ppm, _, err_ppm = _run_cmd(cmd_ppm, timeout_sec=600)
                     if DEBUG_OCR:
                         try:
-                            print(f"[ocr] pages generated: {len(pages)} (cap={N})")
+                            print(f"[ocr] pdftoppm: code={code_ppm} err={(err_ppm or b'').decode(errors='replace')[:200]}")
                         except Exception:
                             pass
-                    texts: list[str] = []
-                    for p in pages:
-                        # Optional pre-processing with ImageMagick, if available
-                        preprocessed = None
-                        if shutil.which("convert"):
+                    # Fallback to pdftocairo if pdftoppm failed
+                    if code_ppm != 0 and _PDFTOCAIRO:
+                        for f in page_futs.values():
+                            f.cancel()
+                        page_futs.clear()
+                        code_ppm, _, err_ppm = _run_cmd([
+                            _PDFTOCAIRO, *_PAGE_FMT_ARGS, "-r", str(int(OCR_DPI)),
+                            str(pdf_path), str(Path(td)/"page"), "-f", "1", "-l", str(N)
+                        ], timeout_sec=600)
+                        if DEBUG_OCR:
                             try:
-                                preprocessed = p.with_name(p.stem + "-prep.png")
-                                # Conservative pipeline: grayscale + normalize + slight sharpen
-                                # Avoid aggressive thresholding to not lose fine glyphs
-                                cmd_conv = [
-                                    "convert", str(p),
-                                    "-colorspace", "Gray",
-                                    "-normalize",
-                                    "-contrast-stretch", "0.5%x0.5%",
-                                    "-sharpen", "0x1",
-                                    str(preprocessed),
-                                ]
-                                cprep, _, eprep = _run_cmd(cmd_conv, timeout_sec=120)
-                                if DEBUG_OCR:
-                                    try:
-                                        print(f"[ocr] preprocess convert page={p.name} code={cprep} err={(eprep or b'').decode(errors='replace')[:120]}")
-                                    except Exception:
-                                        pass
-                                if cprep != 0:
-                                    preprocessed = None
+                                print(f"[ocr] pdftocairo: code={code_ppm} err={(err_ppm or b'').decode(errors='replace')[:200]}")
                             except Exception:
-                                preprocessed = None
+                                pass
 
-                        img_for_ocr = str(preprocessed or p)
-                        c, o, e = _run_cmd(["tesseract", img_for_ocr, "-", "-l", OCR_LANGS, "--oem", "1", "--psm", "6"], timeout_sec=180)
-                        if DEBUG_OCR and c != 0:
+                    if code_ppm == 0:
+                        pages = sorted(Path(td).glob(_PAGE_GLOB))[:N]
+                        if DEBUG_OCR:
                             try:
-                                print(f"[ocr] tesseract page={p.name} code={c} err={(e or b'').decode(errors='replace')[:200]}")
+                                print(f"[ocr] pages generated: {len(pages)} (cap={N})")
                             except Exception:
                                 pass
-                        if c == 0 and o:
-                            texts.append(o.decode("utf-8", errors="replace"))
+                        if stream_pages:
+                            # preprocessing is per image: one pipeline per page, most already running
+                            futs = [page_futs.get(p) or ex.submit(_ocr_page, p) for p in pages]
+                            texts = [t for t in (f.result() for f in futs) if t]
                         else:
-                            # keep going; collect errors optionally
-                            pass
-                    txt = "\n\f\n".join(texts)
-                    ok = len(txt.strip()) > 0
-                    if DEBUG_OCR:
-                        try:
-                            print(f"[ocr] pipeline: using image fallback, pages={len(pages)}, ok={ok}")
-                        except Exception:
-                            pass
-                    info = {"ok": ok, "tool": "pdftoppm+tesseract", "code": 0 if ok else 1, "error": (err_ppm.decode(errors="replace") if not ok else ""), "mode": mode}
-                    return txt, info
+                            # no preprocessing: contiguous page runs, one tesseract init per run
+                            workers = max(1, min(len(pages), OCR_CONCURRENCY))
+                            size = max(1, -(-len(pages) // workers))
+                            batches = [pages[k:k + size] for k in range(0, len(pages), size)]
+                            texts = [t for b in ex.map(_ocr_page_batch, batches) for t in b if t.strip()]
+                        txt = "\n\f\n".join(texts)
+                        ok = len(txt.strip()) > 0
+                        if DEBUG_OCR:
+                            try:
+                                print(f"[ocr] pipeline: using image fallback, pages={len(pages)}, ok={ok}")
+                            except Exception:
+                                pass
+                        info = {"ok": ok, "tool": "pdftoppm+tesseract", "code": 0 if ok else 1, "error": (err_ppm.decode(errors="replace") if not ok else ""), "mode": mode}
+                        return txt, info
+                finally:
+                    ex.shutdown(cancel_futures=True)
             # If no fallback tools or still empty
             info = {"ok": False, "tool": "pdftotext" if mode != "image" else "pdftoppm+tesseract", "code": 1, "error": "empty_output", "mode": mode}
             return "", info
     # Try tesseract for images
-    if shutil.which("tesseract") and (name_lower.endswith(".png") or name_lower.endswith(".jpg") or name_lower.endswith(".jpeg")):
-        with tempfile.TemporaryDirectory() as td:
-            img_path = Path(td) / ("input" + (Path(name_lower).suffix or ".png"))
-            with open(img_path, "wb") as f:
-                f.write(content)
-            code, out, err = _run_cmd(["tesseract", str(img_path), "-", "-l", OCR_LANGS])
-            ok = code == 0 and len(out) > 0
-            info = {"ok": ok, "tool": "tesseract", "code": code, "error": (err.decode(errors="replace") if code != 0 else ""), "mode": mode}
-            return (out.decode("utf-8", errors="replace") if ok else ""), info
+    if _TESSERACT and (name_lower.endswith(".png") or name_lower.endswith(".jpg") or name_lower.endswith(".jpeg")):
+        # leptonica detects the image format from its header, not the file name
+        img_path = Path(path)
+        # None when unreadable for the binding: let the CLI report why
+        out = _tess_ocr(img_path, psm_single_block=False)
+        if out is not None:
+            ok = bool(out)
+            return out, {"ok": ok, "tool": "tesserocr", "code": 0 if ok else 1, "error": "", "mode": mode}
+        code, out, err = _run_cmd([_TESSERACT, str(img_path), "-", "-l", OCR_LANGS], env=_TESS_ENV)
+        ok = code == 0 and len(out) > 0
+        info = {"ok": ok, "tool": "tesseract", "code": code, "error": (err.decode(errors="replace") if code != 0 else ""), "mode": mode}
+        return (out.decode("utf-8", errors="replace") if ok else ""), info
     # Fallback: no tool
     return "", {"ok": False, "tool": "none", "code": 127, "error": "No suitable OCR tool available", "mode": mode}
 
@@ -980,7 +1922,7 @@ def _run_ocr_pipeline(content: bytes, name: str, mode: str = "auto") -> tuple[st
 @app.get("/api/docs/{doc_id}/text")
 def get_doc_text(doc_id: str, request: Request):
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
         _enforce_client_token(request, row)
@@ -991,7 +1933,8 @@ def get_doc_text(doc_id: str, request: Request):
             text_val = meta.get("ocr_text") or ""
             info = meta.get("ocr_info") or {}
             truncated = bool(info.get("truncated")) if isinstance(info, dict) else False
-        return {"doc_id": row.doc_id, "text": text_val, "truncated": truncated}
+        # returned as a response: skips the jsonable_encoder walk over a large text
+        return ORJSONResponse({"doc_id": row.doc_id, "text": text_val, "truncated": truncated})
 
 
 # --- DEBUG: expose DB path and raw origin_meta ---
@@ -1008,21 +1951,21 @@ def debug_doc_raw(doc_id: str):
     if not DEBUG_OCR:
         raise HTTPException(status_code=404, detail="Not Found")
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
-        return {
+        return ORJSONResponse({
             "doc_id": row.doc_id,
             "origin_meta": row.origin_meta,
             "tags": row.tags,
             "updated_at": str(row.updated_at),
-        }
+        })
 
 
 @app.post("/api/docs/{doc_id}/deliver")
 def deliver_doc(doc_id: str, message: str | None = Form(default=None)):
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
         if row.storage != "gdrive" or not row.storage_ref:
@@ -1034,12 +1977,14 @@ def deliver_doc(doc_id: str, message: str | None = Form(default=None)):
         loc_title = row.title
         loc_storage_ref = row.storage_ref
         loc_sha256 = row.sha256_plain or ""
+        # set once the embed path has stored the hash of the uploaded revision
+        did_embed_sync = False
+        # (sha256, md5) of the current Drive content, if the embed path downloaded it
+        downloaded = None
 
         # Optional embedding on deliver (revision mode by default)
         if EMBED_ON_DELIVER and EMBED_MODE == "revision":
             try:
-                # 1) Download current content
-                content = gdrive.download_file_content(loc_storage_ref)
                 # Try to infer extension from Drive name
                 try:
                     nm = gdrive.get_file_name_mime(loc_storage_ref).get("name", "")
@@ -1049,65 +1994,57 @@ def deliver_doc(doc_id: str, message: str | None = Form(default=None)):
                     ext = ""
 
                 with tempfile.TemporaryDirectory() as td:
+                    # 1) Download current content straight to disk
                     in_path = Path(td) / ("input" + ext)
-                    with open(in_path, "wb") as f:
-                        f.write(content)
-
-                    # 2) Run embed_metadata.py to produce with_meta file
-                    cmd = [
-                        sys.executable,
-                        str(Path(__file__).resolve().parents[1] / "scripts" / "embed_metadata.py"),
-                        "--file", str(in_path),
-                        "--doc-id", loc_doc_id,
-                        "--matter-id", loc_matter_id,
-                        "--sha256", loc_sha256,
-                        "--title", loc_title or "",
-                    ]
-                    result = subprocess.run(cmd, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        raise RuntimeError(f"embed_metadata failed: {result.stderr.strip()}")
-                    out_path = Path(result.stdout.strip())
+                    downloaded = gdrive.stream_file_content(loc_storage_ref, str(in_path))
+
+                    # 2) Embed metadata in-process to produce with_meta file
+                    out_path = embed_metadata.embed(in_path, loc_doc_id, loc_matter_id, loc_sha256, loc_title or "")
                     if not out_path.exists():
                         raise RuntimeError("embed_metadata produced no file")
 
-                    # 3) Upload as new version of the same Drive file
-                    gdrive.update_file_content(loc_storage_ref, str(out_path))
+                    # 3) Upload as new version of the same Drive file;
+                    # the upload hashes what it sends, so out_path is read once
+                    uploaded = gdrive.update_file_content(loc_storage_ref, str(out_path))
+                    new_sha = uploaded["sha256"]
 
-                    # 4) Recompute sha256 and update DB
-                    try:
-                        new_sha = compute_sha256(str(out_path))
-                    except Exception:
-                        # fallback: hash freshly downloaded content from Drive
-                        try:
-                            dl = gdrive.download_file_content(loc_storage_ref)
-                            import hashlib
-                            h = hashlib.sha256(); h.update(dl)
-                            new_sha = h.hexdigest()
-                        except Exception as e:
-                            print(f"[deliver] failed to compute new sha256: {e}")
-                            new_sha = None
+                    # 4) Update DB
                     if new_sha:
                         row.sha256_plain = new_sha
                         row.updated_at = datetime.utcnow()
-                        db.add(row)
+                        _set_doc_md5(db, loc_doc_id, uploaded.get("md5"))
                         db.commit()
+                        _invalidate_admin_docs_cache()
                         loc_sha256 = new_sha
+                        did_embed_sync = True
             except Exception as e:
                 # не блокируем выдачу; просто продолжаем без вшивки
                 print(f"[deliver] embed/update skipped due to error: {e}")
 
         # Final sync: ensure DB sha256 matches current Drive content
+        # (not needed when the embed path just stored the uploaded revision's hash;
+        # reuses the embed path's download when it got that far)
+        if not did_embed_sync and downloaded is not None:
+            try:
+                current_sha, current_md5 = downloaded
+                if current_sha and current_sha != (row.sha256_plain or ""):
+                    row.sha256_plain = current_sha
+                    row.updated_at = datetime.utcnow()
+                    _set_doc_md5(db, loc_doc_id, current_md5)
+                    db.commit()
+                    _invalidate_admin_docs_cache()
+                    loc_sha256 = current_sha
+            except Exception as e:
+                print(f"[deliver] sha sync skipped: {e}")
+
+    if not did_embed_sync and downloaded is None:
+        # nothing downloaded yet: the revision check skips the download when Drive is unchanged
         try:
-            dl = gdrive.download_file_content(loc_storage_ref)
-            import hashlib
-            h = hashlib.sha256(); h.update(dl)
-            current_sha = h.hexdigest()
-            if current_sha and current_sha != (row.sha256_plain or ""):
-                row.sha256_plain = current_sha
-                row.updated_at = datetime.utcnow()
-                db.add(row)
-                db.commit()
-                loc_sha256 = current_sha
+            res = _sync_doc_sha(loc_doc_id)
+            if isinstance(res, dict):
+                loc_sha256 = res["sha256_updated"]
+            else:
+                print(f"[deliver] sha sync skipped: {res.body.decode(errors='replace')}")
         except Exception as e:
             print(f"[deliver] sha sync skipped: {e}")
 
@@ -1120,14 +2057,14 @@ def deliver_doc(doc_id: str, message: str | None = Form(default=None)):
     }
     if message:
         payload["message"] = message
-    notify("result_delivered", payload)
+    enqueue_notification("result_delivered", payload)
     return {"ok": True, "doc_id": loc_doc_id, "permalink": permalink}
 
 
 @app.patch("/api/docs/{doc_id}")
 def patch_doc(doc_id: str, payload: PatchDoc):
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
         if payload.title is not None:
@@ -1146,84 +2083,238 @@ def patch_doc(doc_id: str, payload: PatchDoc):
             row.origin = payload.origin
         if payload.origin_meta is not None:
             row.origin_meta = payload.origin_meta
-        db.add(row)
         db.commit()
-        return {"ok": True}
+        _invalidate_admin_docs_cache()
+    # storage, storage_ref and status all feed the permalink redirect
+    _resolve_cache.pop(doc_id, None)
+    return {"ok": True}
 
 
-@app.post("/api/docs/{doc_id}/verify")
-def verify_doc(doc_id: str):
+# Failures worth a 502/503 instead of a generic 500; anything else is a bug and should surface.
+# The Drive transport re-raises httpx errors as ConnectionError / socket.timeout.
+_DRIVE_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError)
+
+
+def _verify_doc(doc_id: str) -> dict:
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
         if row.storage != "gdrive" or not row.storage_ref:
             raise HTTPException(status_code=500, detail="Unsupported storage or missing ref")
-        content = gdrive.download_file_content(row.storage_ref)
-        import hashlib
-        h = hashlib.sha256()
-        h.update(content)
-        current = h.hexdigest()
+        current, _ = gdrive.hash_file_content(row.storage_ref)
         return {"doc_id": doc_id, "sha256_current": current, "sha256_stored": row.sha256_plain, "match": current == row.sha256_plain}
 
 
-@app.post("/api/docs/{doc_id}/sync_sha")
-def sync_doc_sha(doc_id: str):
-    """Пересчитать SHA256 по текущему содержимому на Drive и сохранить в БД."""
+@app.post("/api/docs/{doc_id}/verify")
+async def verify_doc(doc_id: str):
+    # Drive download + hashing is blocking; keep it off the event loop
+    try:
+        return await asyncio.to_thread(_verify_doc, doc_id)
+    except HttpError as e:
+        print(f"[verify] {doc_id}: drive HTTP {e.resp.status}")
+        raise HTTPException(status_code=502, detail=f"Drive error {e.resp.status}")
+    except _DRIVE_ERRORS + (SQLAlchemyError,) as e:
+        print(f"[verify] {doc_id}: {e!r}")
+        raise HTTPException(status_code=503, detail="Temporarily unavailable")
+
+
+# doc_id -> Future of the sync currently running for it; concurrent callers
+# (double clicks, batch + single, background job) share one download
+_sync_inflight: Dict[str, Future] = {}
+_sync_inflight_lock = threading.Lock()
+
+
+def _sync_doc_sha(doc_id: str):
+    with _sync_inflight_lock:
+        fut = _sync_inflight.get(doc_id)
+        owner = fut is None
+        if owner:
+            fut = _sync_inflight[doc_id] = Future()
+    if not owner:
+        return fut.result()
+    try:
+        res = _sync_doc_sha_once(doc_id)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(res)
+        return res
+    finally:
+        with _sync_inflight_lock:
+            _sync_inflight.pop(doc_id, None)
+
+
+def _sync_doc_sha_once(doc_id: str):
     try:
         with SessionLocal() as db:
-            row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+            row = db.get(Doc, doc_id)
             if not row:
-                return JSONResponse(status_code=404, content={"error": "Doc not found"})
+                return ORJSONResponse(status_code=404, content={"error": "Doc not found"})
             if row.storage != "gdrive" or not row.storage_ref:
-                return JSONResponse(status_code=500, content={"error": "Unsupported storage or missing ref"})
+                return ORJSONResponse(status_code=500, content={"error": "Unsupported storage or missing ref"})
             prev = row.sha256_plain
-            content = gdrive.download_file_content(row.storage_ref)
-            import hashlib
-            h = hashlib.sha256(); h.update(content)
-            current = h.hexdigest()
+            # a metadata call is enough when Drive still has the revision we hashed last time
+            revision, _ = gdrive.get_file_revision(row.storage_ref)
+            known = db.execute(
+                text("SELECT gdrive_revision_id FROM docs WHERE doc_id=:d"), {"d": doc_id}
+            ).scalar()
+            if revision and prev and revision == known:
+                return {"doc_id": doc_id, "sha256_previous": prev, "sha256_updated": prev, "changed": False}
+            current, md5 = gdrive.hash_file_content(row.storage_ref)
             changed = current != prev
             if changed:
-                row.sha256_plain = current
-                row.updated_at = datetime.utcnow()
-                db.add(row)
+                db.execute(
+                    update(Doc)
+                    .where(Doc.doc_id == doc_id)
+                    .values(sha256_plain=current, updated_at=datetime.utcnow())
+                )
+                _set_doc_md5(db, doc_id, md5)
+            if changed or revision != known:
+                db.execute(
+                    text("UPDATE docs SET gdrive_revision_id=:r WHERE doc_id=:d"),
+                    {"r": revision, "d": doc_id},
+                )
                 db.commit()
+                _invalidate_admin_docs_cache()
             return {"doc_id": doc_id, "sha256_previous": prev, "sha256_updated": current, "changed": changed}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+    except HttpError as e:
+        print(f"[sync_sha] {doc_id}: drive HTTP {e.resp.status}")
+        return ORJSONResponse(status_code=502, content={"error": f"Drive error {e.resp.status}"})
+    except _DRIVE_ERRORS + (SQLAlchemyError,) as e:
+        print(f"[sync_sha] {doc_id}: {e!r}")
+        return ORJSONResponse(status_code=503, content={"error": "Temporarily unavailable"})
+
+
+@app.post("/api/docs/{doc_id}/sync_sha")
+async def sync_doc_sha(doc_id: str):
+    """Пересчитать SHA256 по текущему содержимому на Drive и сохранить в БД."""
+    return await asyncio.to_thread(_sync_doc_sha, doc_id)
 
 
 # --- B4: Admin view ---
+# Short-lived in-process cache of listing pages, keyed by the query shape and
+# dropped on every write that touches the listed columns.
+ADMIN_DOCS_CACHE_TTL = 30.0
+ADMIN_DOCS_CACHE_MAX = 256
+ADMIN_DOCS_STREAM_BUFFER = 64  # template fragments per flushed chunk
+_admin_docs_cache: Dict[tuple, tuple] = {}
+
+
+def _invalidate_admin_docs_cache() -> None:
+    _admin_docs_cache.clear()
+
+
+# Keyset pagination over (updated_at DESC, doc_id DESC): the cursor is the sort key
+# of the boundary row, so every page is an index range scan instead of OFFSET N.
+def _encode_cursor(row) -> str:
+    key = [row.updated_at.isoformat() if row.updated_at else None, row.doc_id]
+    return base64.urlsafe_b64encode(orjson.dumps(key)).decode("ascii")
+
+
+def _decode_cursor(token: str) -> tuple[datetime | None, str]:
+    try:
+        ts, doc_id = orjson.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return (datetime.fromisoformat(ts) if ts else None), str(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_key(ts: datetime | None, doc_id: str):
+    # rows that sort after (ts, doc_id) in DESC order; NULL updated_at sorts last
+    if ts is None:
+        return and_(Doc.updated_at.is_(None), Doc.doc_id < doc_id)
+    return or_(
+        Doc.updated_at < ts,
+        and_(Doc.updated_at == ts, Doc.doc_id < doc_id),
+        Doc.updated_at.is_(None),
+    )
+
+
+def _before_key(ts: datetime | None, doc_id: str):
+    if ts is None:
+        return or_(Doc.updated_at.is_not(None), Doc.doc_id > doc_id)
+    return and_(
+        Doc.updated_at.is_not(None),
+        or_(Doc.updated_at > ts, and_(Doc.updated_at == ts, Doc.doc_id > doc_id)),
+    )
+
+
+# Only what admin/docs.html renders; rows come back as plain tuples, no ORM hydration
+_ADMIN_DOC_COLUMNS = (Doc.doc_id, Doc.matter_id, Doc.title, Doc.status, Doc.sha256_plain, Doc.updated_at)
+
+
+def _admin_docs_rows(
+    matter_id: Optional[str],
+    status: Optional[str],
+    per_page: int,
+    cursor: Optional[str],
+    before: Optional[str],
+) -> tuple[list, bool, int | None]:
+    """Return one page of docs, whether more lie beyond it, and the filter total.
+
+    The total comes from a COUNT(*) OVER () column in the same query, and only on
+    the first page: with a cursor the window would count just the rows past it.
+    """
+    first_page = not (cursor or before)
+    cols = _ADMIN_DOC_COLUMNS + (func.count().over().label("total"),) if first_page else _ADMIN_DOC_COLUMNS
+    q = select(*cols)
+    if matter_id:
+        q = q.where(Doc.matter_id == matter_id)
+    if status:
+        q = q.where(Doc.status == status)
+    if before:
+        q = q.where(_before_key(*_decode_cursor(before)))
+        q = q.order_by(Doc.updated_at.asc().nulls_first(), Doc.doc_id.asc())
+    else:
+        if cursor:
+            q = q.where(_after_key(*_decode_cursor(cursor)))
+        q = q.order_by(desc(Doc.updated_at).nulls_last(), desc(Doc.doc_id))
+    with SessionLocal() as db:
+        rows = db.execute(q.limit(per_page + 1)).all()
+    total = (rows[0].total if rows else 0) if first_page else None
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before:
+        rows.reverse()
+    return rows, more, total
+
+
 @app.get("/admin/docs")
-def admin_docs(
+async def admin_docs(
     request: Request,
     limit: int = 200,  # deprecated, kept for backward compat
     matter_id: Optional[str] = None,
     status: Optional[str] = None,
     page: int = 1,
     per_page: int = 50,
+    cursor: Optional[str] = None,
+    before: Optional[str] = None,
 ):
     page = max(1, page)
     per_page = max(1, min(200, per_page))
-    with SessionLocal() as db:
-        q = select(Doc)
-        if matter_id:
-            q = q.where(Doc.matter_id == matter_id)
-        if status:
-            q = q.where(Doc.status == status)
-        # order by updated_at desc (NULLS LAST) then doc_id desc
-        try:
-            q = q.order_by(desc(Doc.updated_at), desc(Doc.doc_id))
-        except Exception:
-            pass
-        offset = (page - 1) * per_page
-        q = q.offset(offset).limit(per_page)
-        rows = db.execute(q).scalars().all()
-    # pagination hints
-    has_next = len(rows) == per_page
-    has_prev = page > 1
-    return templates.TemplateResponse(
-        "admin/docs.html",
+    key = (matter_id or "", status or "", per_page, cursor or "", before or "")
+    hit = _admin_docs_cache.get(key)
+    if hit and hit[0] > time.monotonic():
+        rows, more, total = hit[1]
+    else:
+        rows, more, total = await asyncio.to_thread(_admin_docs_rows, matter_id, status, per_page, cursor, before)
+        if len(_admin_docs_cache) >= ADMIN_DOCS_CACHE_MAX:
+            _admin_docs_cache.clear()
+        _admin_docs_cache[key] = (time.monotonic() + ADMIN_DOCS_CACHE_TTL, (rows, more, total))
+    sync_states = await asyncio.to_thread(_sync_job_states, [r.doc_id for r in rows])
+    # pagination hints; `page` is only a label now, the cursors drive navigation
+    if before:
+        # walking backwards the overflow row says whether anything precedes this page,
+        # and the cursor row itself follows it
+        has_next = True
+        has_prev = more
+    else:
+        has_next = more
+        has_prev = cursor is not None
+    # stream the page: the header and first rows flush while the rest still renders
+    stream = templates.get_template("admin/docs.html").stream(
         {
             "request": request,
             "docs": rows,
@@ -1232,16 +2323,29 @@ def admin_docs(
             "statuses": ["draft", "submitted", "triage", "registered"],
             "page": page,
             "per_page": per_page,
-            "has_next": has_next,
-            "has_prev": has_prev,
+            "total": total,
+            "sync_states": sync_states,
+            "has_next": has_next and bool(rows),
+            "has_prev": has_prev and bool(rows),
+            "next_cursor": _encode_cursor(rows[-1]) if rows else "",
+            "prev_cursor": _encode_cursor(rows[0]) if rows else "",
         },
     )
+    stream.enable_buffering(ADMIN_DOCS_STREAM_BUFFER)
+    return StreamingResponse(stream, media_type="text/html; charset=utf-8")
 
 
 # --- Admin: list duplicate doc_ids
+DUPLICATES_LIMIT = 1000
+
 @app.get("/api/admin/docs/duplicates")
 def admin_list_doc_duplicates():
     with engine.connect() as conn:
+        # uidx_docs_doc_id makes duplicates impossible: skip the full aggregate
+        if conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='index' AND name='uidx_docs_doc_id'")
+        ).first():
+            return {"duplicates": []}
         rows = conn.execute(text(
             """
             SELECT doc_id, COUNT(*) as cnt
@@ -1249,8 +2353,9 @@ def admin_list_doc_duplicates():
             GROUP BY doc_id
             HAVING cnt > 1
             ORDER BY cnt DESC
+            LIMIT :limit
             """
-        )).fetchall()
+        ), {"limit": DUPLICATES_LIMIT}).fetchall()
         return {"duplicates": [{"doc_id": r[0], "count": r[1]} for r in rows]}
 
 
@@ -1262,12 +2367,14 @@ def admin_requeue_ocr(doc_id: str, mode: str = "auto"):
         mode = "auto"
     # ensure doc exists
     with SessionLocal() as db:
-        row = db.execute(select(Doc).where(Doc.doc_id == doc_id)).scalar_one_or_none()
+        row = db.get(Doc, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Doc not found")
-    jid = _enqueue_job("ocr", {"doc_id": doc_id, "mode": mode})
-    return {"ok": True, "job_id": jid}
+    jid, dup = _enqueue_ocr_once(doc_id, mode)
+    return {"ok": True, "job_id": jid, "deduplicated": dup}
+
 
+REQUEUE_YIELD_PER = 500
 
 @app.post("/api/admin/ocr/requeue_batch")
 def admin_requeue_ocr_batch(matter_id: str, mode: str = "auto"):
@@ -1275,66 +2382,184 @@ def admin_requeue_ocr_batch(matter_id: str, mode: str = "auto"):
     if mode not in ("auto", "image", "pdf"):
         mode = "auto"
     count = 0
+    q = select(Doc.doc_id).where(Doc.matter_id == matter_id).execution_options(yield_per=REQUEUE_YIELD_PER)
+    insert_job = text(
+        "INSERT INTO jobs (type, payload, status, attempts, created_at, updated_at) "
+        "VALUES ('ocr', :p, 'pending', 0, :c, :u)"
+    )
     with SessionLocal() as db:
-        rows = db.execute(select(Doc.doc_id).where(Doc.matter_id == matter_id)).scalars().all()
-        for did in rows:
-            _enqueue_job("ocr", {"doc_id": did, "mode": mode})
-            count += 1
+        # stream doc_ids in fixed-size partitions; jobs go through the same connection,
+        # so SQLite never sees a writer waiting on our own open read cursor
+        for ids in db.execute(q).scalars().partitions():
+            now = datetime.utcnow().isoformat() + "Z"
+            db.execute(
+                insert_job,
+                [{"p": orjson.dumps({"doc_id": did, "mode": mode}).decode(), "c": now, "u": now} for did in ids],
+            )
+            count += len(ids)
+        db.commit()
+    if count:
+        _wake_ocr_worker()
     return {"ok": True, "enqueued": count, "mode": mode}
 
 
 @app.post("/admin/docs/{doc_id}/verify")
-def admin_docs_verify(doc_id: str):
+async def admin_docs_verify(doc_id: str):
     # выполнить проверку и показать результат в баннере
     msg = ""
     try:
-        res = verify_doc(doc_id)
+        res = await verify_doc(doc_id)
         ok = res.get("match")
         msg = f"Verify {doc_id}: match={ok}"
-    except Exception as e:
-        msg = f"Verify {doc_id}: error: {e}"
+    except HTTPException as e:
+        msg = f"Verify {doc_id}: error: {e.detail}"
     return RedirectResponse(url=f"/admin/docs?msg={msg}", status_code=303)
 
 
 # --- C1.4: Admin status transitions ---
+def _set_doc_status(doc_id: str, target: str) -> bool:
+    # single UPDATE round-trip; rowcount tells us whether the doc exists
+    with SessionLocal() as db:
+        res = db.execute(
+            update(Doc)
+            .where(Doc.doc_id == doc_id)
+            .values(status=target, updated_at=datetime.utcnow())
+        )
+        db.commit()
+        _invalidate_admin_docs_cache()
+    # status decides whether the permalink needs a client token
+    _resolve_cache.pop(doc_id, None)
+    return res.rowcount > 0
+
+
 @app.post("/admin/docs/{doc_id}/status")
-def admin_docs_set_status(doc_id: str, target: str = Form(...)):
+async def admin_docs_set_status(doc_id: str, target: str = Form(...)):
     allowed = {"draft", "submitted", "triage", "registered"}
     if target not in allowed:
         return RedirectResponse(url=f"/admin/docs?msg=Unknown+status", status_code=303)
     msg = ""
     try:
-        with SessionLocal() as db:
-            row = db.get(Doc, doc_id)
-            if not row:
-                return RedirectResponse(url=f"/admin/docs?msg=Not+found", status_code=303)
-            row.status = target
-            row.updated_at = datetime.utcnow()
-            db.add(row)
-            db.commit()
+        if not await asyncio.to_thread(_set_doc_status, doc_id, target):
+            return RedirectResponse(url=f"/admin/docs?msg=Not+found", status_code=303)
         msg = f"Status {doc_id} → {target}"
     except Exception as e:
         msg = f"Status {doc_id} error: {e}"
     return RedirectResponse(url=f"/admin/docs?msg={msg}", status_code=303)
 
 
+# --- Admin: batch verify / sync over many docs ---
+SYNC_BATCH_CONCURRENCY = 8  # parallel Drive downloads; keeps us under the per-user QPS limit
+
+
+def _filtered_doc_ids(matter_id: str, status: str) -> List[str]:
+    q = select(Doc.doc_id)
+    if matter_id:
+        q = q.where(Doc.matter_id == matter_id)
+    if status:
+        q = q.where(Doc.status == status)
+    with SessionLocal() as db:
+        return db.execute(q).scalars().all()
+
+
+async def _fan_out(fn, doc_ids: List[str]) -> list:
+    """Run blocking fn(doc_id) for all ids, at most SYNC_BATCH_CONCURRENCY at a time."""
+    sem = asyncio.Semaphore(SYNC_BATCH_CONCURRENCY)
+
+    async def one(doc_id: str):
+        async with sem:
+            return await asyncio.to_thread(fn, doc_id)
+
+    return await asyncio.gather(*(one(d) for d in doc_ids), return_exceptions=True)
+
+
+async def _batch_doc_ids(doc_ids: List[str], matter_id: str, status: str) -> List[str]:
+    # explicit ids win; otherwise everything matching the listing filter
+    if doc_ids:
+        return list(dict.fromkeys(doc_ids))
+    return await asyncio.to_thread(_filtered_doc_ids, matter_id, status)
+
+
+@app.post("/admin/docs/sync_sha_batch")
+async def admin_docs_sync_sha_batch(
+    doc_ids: List[str] = Form(default=[]),
+    matter_id: str = Form(""),
+    status: str = Form(""),
+):
+    ids = await _batch_doc_ids(doc_ids, matter_id, status)
+    results = await _fan_out(_sync_doc_sha, ids)
+    changed = sum(1 for r in results if isinstance(r, dict) and r.get("changed"))
+    errors = sum(1 for r in results if not isinstance(r, dict))
+    msg = f"Sync batch: {len(ids)} docs, changed={changed}, errors={errors}"
+    return RedirectResponse(url=f"/admin/docs?msg={msg}", status_code=303)
+
+
+@app.post("/admin/docs/verify_batch")
+async def admin_docs_verify_batch(
+    doc_ids: List[str] = Form(default=[]),
+    matter_id: str = Form(""),
+    status: str = Form(""),
+):
+    ids = await _batch_doc_ids(doc_ids, matter_id, status)
+    results = await _fan_out(_verify_doc, ids)
+    mismatched = sum(1 for r in results if isinstance(r, dict) and not r.get("match"))
+    errors = sum(1 for r in results if not isinstance(r, dict))
+    msg = f"Verify batch: {len(ids)} docs, mismatch={mismatched}, errors={errors}"
+    return RedirectResponse(url=f"/admin/docs?msg={msg}", status_code=303)
+
+
 # --- C1: Intake UI (basic form) ---
 @app.get("/intake")
 def intake_form(request: Request):
     return templates.TemplateResponse("intake/form.html", {"request": request})
 
 
-@app.post("/admin/docs/{doc_id}/sync_sha")
-def admin_docs_sync_sha(doc_id: str):
-    msg = ""
+def _record_sync_job(doc_id: str, status: str, result: dict | None = None) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO sync_jobs (doc_id, status, result, updated_at)
+                VALUES (:doc_id, :status, :result, :ts)
+                ON CONFLICT(doc_id) DO UPDATE SET
+                    status=excluded.status, result=excluded.result, updated_at=excluded.updated_at
+                """
+            ),
+            {
+                "doc_id": doc_id,
+                "status": status,
+                "result": orjson.dumps(result).decode() if result is not None else None,
+                "ts": datetime.utcnow(),
+            },
+        )
+
+
+def _sync_doc_sha_job(doc_id: str) -> None:
+    """BackgroundTasks entry point: run the sync and persist its outcome."""
     try:
-        res = sync_doc_sha(doc_id)
-        if isinstance(res, JSONResponse):
-            # unwrap JSONResponse content for message
-            msg = f"Sync {doc_id}: status={res.status_code}"
-        else:
-            changed = res.get("changed")
-            msg = f"Sync {doc_id}: changed={changed}"
+        res = _sync_doc_sha(doc_id)
     except Exception as e:
-        msg = f"Sync {doc_id}: error: {e}"
-    return RedirectResponse(url=f"/admin/docs?msg={msg}", status_code=303)
+        # unexpected failure: record it so the row does not stay "queued", then surface it
+        _record_sync_job(doc_id, "error", {"error": repr(e)})
+        raise
+    if isinstance(res, ORJSONResponse):
+        _record_sync_job(doc_id, "error", orjson.loads(res.body))
+    else:
+        _record_sync_job(doc_id, "changed" if res.get("changed") else "unchanged", res)
+
+
+def _sync_job_states(doc_ids: List[str]) -> Dict[str, str]:
+    if not doc_ids:
+        return {}
+    stmt = text("SELECT doc_id, status FROM sync_jobs WHERE doc_id IN :ids").bindparams(
+        bindparam("ids", expanding=True)
+    )
+    with engine.connect() as conn:
+        return {r[0]: r[1] for r in conn.execute(stmt, {"ids": doc_ids})}
+
+
+@app.post("/admin/docs/{doc_id}/sync_sha")
+async def admin_docs_sync_sha(doc_id: str, background_tasks: BackgroundTasks):
+    # the Drive download + hash runs after the redirect; the result lands in sync_jobs
+    await asyncio.to_thread(_record_sync_job, doc_id, "queued")
+    background_tasks.add_task(_sync_doc_sha_job, doc_id)
+    return RedirectResponse(url=f"/admin/docs?msg=Sync {doc_id}: queued", status_code=303)